@@ -24,6 +24,7 @@ from core.logic.phase1.context_indexer import (
     ContextIndexer,
     TopicRetriever,
     index_content_for_rag,
+    index_many_for_rag,
     search_context,
     cleanup_vector_db,
     create_topic_retriever,
@@ -63,6 +64,7 @@ __all__ = [
     "ContextIndexer",
     "TopicRetriever",
     "index_content_for_rag",
+    "index_many_for_rag",
     "search_context",
     "cleanup_vector_db",
     "create_topic_retriever",
@@ -21,17 +21,22 @@ CORRECCIONES V3.1:
 
 from __future__ import annotations
 
+import logging
 import os
 import shutil
 import time
-from datetime import datetime
+from collections import OrderedDict
+from dataclasses import replace
 from pathlib import Path
 from typing import Any, Optional
 
+import numpy as np
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Importar componentes de indexing
 from core.logic.phase1.indexing.hierarchical_chunker import (
     HierarchicalChunker,
@@ -59,6 +64,133 @@ DEFAULT_CHUNK_SIZE = 800
 DEFAULT_CHUNK_OVERLAP = 150
 DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
 
+# Cache de búsquedas (LRU + TTL)
+SEARCH_CACHE_MAXSIZE = 1024
+SEARCH_CACHE_TTL_SECONDS = 3600
+SEMANTIC_CACHE_THRESHOLD = 0.97     # Similitud mínima para reutilizar una query
+SEMANTIC_CACHE_WINDOW = 64          # Últimas N queries comparadas por fuente
+QUERY_EMBEDDING_CACHE_SIZE = 256
+DOCUMENT_CACHE_SIZE = 8             # Documentos recientes en memoria (LRU)
+
+
+# =============================================================================
+# CACHE DE BÚSQUEDA
+# =============================================================================
+
+def _copy_results(results: list[SearchResult]) -> list[SearchResult]:
+    """
+    Copias independientes de resultados (la metadata de ChromaDB solo
+    tiene valores escalares: basta copiar el dict).
+    """
+    return [replace(result, metadata=dict(result.metadata)) for result in results]
+
+
+class _SearchCache:
+    """
+    Cache LRU + TTL de resultados de búsqueda.
+    
+    Dos niveles:
+    1. Exacto: clave (source_id, query normalizada, k) → sin embedding ni HNSW
+    2. Semántico: compara el embedding de la query contra las últimas
+       queries cacheadas de la misma fuente → evita la búsqueda vectorial
+    
+    Guarda y entrega copias de los resultados: modificar un resultado
+    devuelto no altera hits posteriores.
+    """
+    
+    def __init__(
+        self,
+        maxsize: int = SEARCH_CACHE_MAXSIZE,
+        ttl: float = SEARCH_CACHE_TTL_SECONDS,
+        semantic_threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        semantic_window: int = SEMANTIC_CACHE_WINDOW,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self.semantic_window = semantic_window
+        
+        # clave → (expira_en, query_embedding, resultados)
+        self._entries: OrderedDict[tuple[str, str, int], tuple[float, list[float], list[SearchResult]]] = OrderedDict()
+    
+    @staticmethod
+    def make_key(source_id: str, query: str, k: int) -> tuple[str, str, int]:
+        return (source_id, query.strip().lower(), k)
+    
+    def get(self, key: tuple[str, str, int]) -> Optional[list[SearchResult]]:
+        """Búsqueda exacta por clave."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return _copy_results(entry[2])
+    
+    def get_similar(
+        self,
+        source_id: str,
+        k: int,
+        query_embedding: list[float],
+    ) -> Optional[list[SearchResult]]:
+        """Búsqueda semántica: reutiliza una query casi idéntica ya cacheada."""
+        now = time.monotonic()
+        keys = []
+        vectors = []
+        
+        # Recorrer de la más reciente a la más antigua
+        for key, (expires_at, embedding, _) in reversed(self._entries.items()):
+            if key[0] != source_id or key[2] != k or expires_at < now:
+                continue
+            keys.append(key)
+            vectors.append(embedding)
+            if len(keys) >= self.semantic_window:
+                break
+        
+        if not keys:
+            return None
+        
+        matrix = np.asarray(vectors, dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        norms = np.where(norms == 0, 1, norms)  # Evitar división por 0
+        similarities = np.dot(matrix, query) / norms
+        
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.semantic_threshold:
+            return None
+        
+        self._entries.move_to_end(keys[best])
+        return _copy_results(self._entries[keys[best]][2])
+    
+    def put(
+        self,
+        key: tuple[str, str, int],
+        query_embedding: list[float],
+        results: list[SearchResult],
+    ) -> None:
+        if self.maxsize <= 0:
+            return
+        
+        self._entries[key] = (time.monotonic() + self.ttl, query_embedding, _copy_results(results))
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, source_id: Optional[str] = None) -> None:
+        """Descarta entradas de una fuente (o todas si es None)."""
+        if source_id is None:
+            self._entries.clear()
+            return
+        
+        for key in [key for key in self._entries if key[0] == source_id]:
+            del self._entries[key]
+
 
 # =============================================================================
 # CONTEXT INDEXER V3
@@ -85,19 +217,35 @@ class ContextIndexer:
         chunk_size: int = DEFAULT_CHUNK_SIZE,
         chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
         embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+        embedding_dtype: Optional[str] = None,
+        enable_quantization: bool = False,
+        parallel_writes: bool = False,
+        search_cache_size: int = SEARCH_CACHE_MAXSIZE,
+        search_cache_ttl: float = SEARCH_CACHE_TTL_SECONDS,
     ):
         self.db_path = Path(db_path)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.embedding_model = embedding_model
+        self.embedding_dtype = embedding_dtype
+        self.enable_quantization = enable_quantization
+        self.parallel_writes = parallel_writes
         
         # Componentes lazy-loaded
         self._chunker: Optional[HierarchicalChunker] = None
         self._embedder: Optional[MultiGranularEmbedder] = None
         self._index_cache: dict[str, HierarchicalIndex] = {}
         
-        # Cache de documentos indexados
-        self._indexed_docs: dict[str, HierarchicalDocument] = {}
+        # Últimos documentos indexados o cargados (LRU acotado); el resto
+        # se reconstruye desde ChromaDB (ver get_document)
+        self._indexed_docs: OrderedDict[str, HierarchicalDocument] = OrderedDict()
+        
+        # Cache de resultados de búsqueda
+        self._search_cache = _SearchCache(
+            maxsize=search_cache_size,
+            ttl=search_cache_ttl,
+        )
+        self._query_embeddings: OrderedDict[str, list[float]] = OrderedDict()
     
     @property
     def chunker(self) -> HierarchicalChunker:
@@ -113,6 +261,7 @@ class ContextIndexer:
         if self._embedder is None:
             self._embedder = MultiGranularEmbedder(
                 model=self.embedding_model,
+                embedding_dtype=self.embedding_dtype,
             )
         return self._embedder
     
@@ -122,6 +271,8 @@ class ContextIndexer:
             self._index_cache[source_id] = HierarchicalIndex(
                 base_path=self.db_path,
                 source_id=source_id,
+                enable_quantization=self.enable_quantization,
+                parallel_writes=self.parallel_writes,
             )
         return self._index_cache[source_id]
     
@@ -161,39 +312,83 @@ class ContextIndexer:
         Returns:
             Estadísticas de indexación
         """
-        start_time = datetime.now()
+        return self.index_many([(source_id, text, metadata)])[0]
+    
+    def index_many(
+        self,
+        items: list[tuple[str, str, Optional[dict]]],
+    ) -> list[dict[str, Any]]:
+        """
+        Indexa varios documentos compartiendo los batches de embeddings.
         
-        # 1. Chunking jerárquico
-        print(f"[ContextIndexer] Chunking documento {source_id}...")
-        hierarchical_doc = self.chunker.chunk_document(text, source_id)
+        El chunking se hace por documento, pero los textos de todos los
+        documentos se embeben juntos: indexar N fuentes pequeñas cuesta
+        casi lo mismo en llamadas a la API que indexar una grande.
         
-        # 2. Generar embeddings
-        print(f"[ContextIndexer] Generando embeddings para {len(hierarchical_doc.chunks)} chunks...")
-        doc_embeddings = self.embedder.embed_document(
-            hierarchical_doc,
-            include_contextualized=True,
-        )
+        `elapsed_seconds` de cada documento suma su chunking, su
+        indexación y la parte de la llamada de embeddings compartida que
+        le corresponde según su número de chunks.
         
-        # 3. Indexar en ChromaDB
-        print(f"[ContextIndexer] Indexando en ChromaDB...")
-        index = self.get_index(source_id)
-        index_stats = index.index_document(hierarchical_doc, doc_embeddings)
+        Args:
+            items: Lista de (source_id, text, metadata)
+            
+        Returns:
+            Estadísticas de indexación por documento, en el mismo orden
+        """
+        if not items:
+            return []
         
-        # 4. Cachear documento para referencias
-        self._indexed_docs[source_id] = hierarchical_doc
+        # 1. Chunking jerárquico
+        hierarchical_docs = []
+        doc_ns = []
+        logger.info("[ContextIndexer] Chunking de %d documento(s)...", len(items))
+        for source_id, text, _metadata in items:
+            logger.debug("[ContextIndexer] Chunking documento %s", source_id)
+            start_ns = time.perf_counter_ns()
+            hierarchical_docs.append(self.chunker.chunk_document(text, source_id))
+            doc_ns.append(time.perf_counter_ns() - start_ns)
+        
+        # 2. Generar embeddings (batches compartidos entre documentos)
+        total_chunks = sum(len(doc.chunks) for doc in hierarchical_docs)
+        logger.info("[ContextIndexer] Generando embeddings para %d chunks...", total_chunks)
+        start_ns = time.perf_counter_ns()
+        all_embeddings = self.embedder.embed_documents(
+            hierarchical_docs,
+            include_contextualized=True,
+        )
+        embed_ns = time.perf_counter_ns() - start_ns
         
-        elapsed = (datetime.now() - start_time).total_seconds()
+        # Repartir la llamada compartida en proporción a los chunks
+        for i, hierarchical_doc in enumerate(hierarchical_docs):
+            doc_ns[i] += embed_ns * len(hierarchical_doc.chunks) // max(total_chunks, 1)
         
-        return {
-            "source_id": source_id,
-            "blocks_count": len(hierarchical_doc.blocks),
-            "chunks_count": len(hierarchical_doc.chunks),
-            "chunks_indexed": index_stats.get("chunks_indexed", 0),
-            "blocks_indexed": index_stats.get("blocks_indexed", 0),
-            "embedding_model": self.embedding_model,
-            "elapsed_seconds": elapsed,
-            "db_path": str(index.index_path),
-        }
+        # 3. Indexar en ChromaDB
+        logger.info("[ContextIndexer] Indexando en ChromaDB...")
+        results = []
+        for i, (hierarchical_doc, doc_embeddings) in enumerate(
+            zip(hierarchical_docs, all_embeddings)
+        ):
+            start_ns = time.perf_counter_ns()
+            source_id = hierarchical_doc.source_id
+            index = self.get_index(source_id)
+            index_stats = index.index_document(hierarchical_doc, doc_embeddings)
+            
+            # 4. Cachear documento para referencias
+            self._remember_document(source_id, hierarchical_doc)
+            self._search_cache.invalidate(source_id)
+            
+            results.append({
+                "source_id": source_id,
+                "blocks_count": len(hierarchical_doc.blocks),
+                "chunks_count": len(hierarchical_doc.chunks),
+                "chunks_indexed": index_stats.get("chunks_indexed", 0),
+                "blocks_indexed": index_stats.get("blocks_indexed", 0),
+                "embedding_model": self.embedding_model,
+                "db_path": str(index.index_path),
+                "elapsed_seconds": (doc_ns[i] + time.perf_counter_ns() - start_ns) / 1e9,
+            })
+        
+        return results
     
     def search(
         self,
@@ -212,14 +407,58 @@ class ContextIndexer:
         Returns:
             Lista de SearchResult
         """
-        index = self.get_index(source_id)
-        query_embedding = self.embedder.embed_query(query)
+        return self._search_chunks_cached(source_id, query, k)
+    
+    def _search_chunks_cached(
+        self,
+        source_id: str,
+        query: str,
+        k: int,
+    ) -> list[SearchResult]:
+        """
+        Búsqueda de chunks con cache LRU + TTL.
+        
+        Hit exacto: sin embedding ni búsqueda vectorial.
+        Hit semántico: sin búsqueda vectorial.
+        """
+        key = self._search_cache.make_key(source_id, query, k)
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        query_embedding = self._embed_query_cached(query)
+        cached = self._search_cache.get_similar(source_id, k, query_embedding)
+        if cached is not None:
+            return cached
         
-        return index.search_chunks(
+        index = self.get_index(source_id)
+        results = index.search_chunks(
             query_embedding=query_embedding,
             k=k,
             filter_source=source_id,
         )
+        
+        self._search_cache.put(key, query_embedding, results)
+        return results
+    
+    def _embed_query_cached(self, query: str) -> list[float]:
+        """
+        Embedding de query con cache LRU.
+        
+        Cubre las búsquedas que fallan en el cache de resultados (otro k,
+        otra fuente) pero repiten el texto de la query.
+        """
+        key = query.strip().lower()
+        embedding = self._query_embeddings.get(key)
+        if embedding is not None:
+            self._query_embeddings.move_to_end(key)
+            return embedding
+        
+        embedding = self.embedder.embed_query(query)
+        self._query_embeddings[key] = embedding
+        if len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+            self._query_embeddings.popitem(last=False)
+        return embedding
     
     def search_with_context(
         self,
@@ -241,23 +480,38 @@ class ContextIndexer:
             Lista de dicts con chunk y contexto
         """
         index = self.get_index(source_id)
-        query_embedding = self.embedder.embed_query(query)
         
         # Buscar chunks
-        results = index.search_chunks(
-            query_embedding=query_embedding,
-            k=k,
-            filter_source=source_id,
+        results = self._search_chunks_cached(source_id, query, k)
+        
+        # Deduplicar conservando el orden
+        unique_results = []
+        seen_ids = set()
+        for result in results:
+            if result.id not in seen_ids:
+                seen_ids.add(result.id)
+                unique_results.append(result)
+        
+        # Padres y vecinos en una consulta por colección (no una por resultado)
+        parents = index.get_blocks_by_ids(
+            [r.metadata.get("block_id") for r in unique_results]
         )
+        neighbors_by_id = {}
+        if expand_neighbors:
+            neighbors_by_id = index.get_chunks_by_ids(
+                [
+                    neighbor_id
+                    for r in unique_results
+                    for neighbor_id in (
+                        r.metadata.get("prev_chunk_id"),
+                        r.metadata.get("next_chunk_id"),
+                    )
+                ]
+            )
         
         enriched = []
-        seen_ids = set()
         
-        for result in results:
-            if result.id in seen_ids:
-                continue
-            seen_ids.add(result.id)
-            
+        for result in unique_results:
             entry = {
                 "chunk_id": result.id,
                 "content": result.content,
@@ -265,19 +519,22 @@ class ContextIndexer:
                 "metadata": result.metadata,
             }
             
-            # Obtener padre
-            parent = index.get_parent_block(result.id)
+            # Padre
+            parent = parents.get(result.metadata.get("block_id"))
             if parent:
                 entry["parent_heading"] = parent.metadata.get("heading", "")
                 entry["parent_summary"] = parent.content[:200] if parent.content else ""
             
-            # Obtener vecinos
+            # Vecinos
             if expand_neighbors:
-                neighbors = index.get_neighbor_chunks(result.id, window=1)
+                neighbors = (
+                    neighbors_by_id.get(result.metadata.get("prev_chunk_id")),
+                    neighbors_by_id.get(result.metadata.get("next_chunk_id")),
+                )
                 entry["neighbors"] = [
                     {"id": n.id, "content": n.content[:100]}
                     for n in neighbors
-                    if n.id != result.id
+                    if n and n.id != result.id
                 ]
             
             enriched.append(entry)
@@ -285,8 +542,30 @@ class ContextIndexer:
         return enriched
     
     def get_document(self, source_id: str) -> Optional[HierarchicalDocument]:
-        """Obtiene documento jerárquico cacheado."""
-        return self._indexed_docs.get(source_id)
+        """
+        Obtiene el documento jerárquico de una fuente.
+        
+        Los últimos DOCUMENT_CACHE_SIZE documentos se sirven desde memoria
+        tal como los produjo el chunker. Si ya salió del LRU, se reconstruye
+        desde la metadata del índice (ver HierarchicalIndex.load_document),
+        con pérdidas: el contenido de cada bloque es su resumen y los chunks
+        no conservan char_start/char_end.
+        """
+        doc = self._indexed_docs.get(source_id)
+        if doc is not None:
+            self._indexed_docs.move_to_end(source_id)
+        elif (self.db_path / source_id).exists():
+            doc = self.get_index(source_id).load_document(source_id)
+            if doc is not None:
+                self._remember_document(source_id, doc)
+        return doc
+    
+    def _remember_document(self, source_id: str, doc: HierarchicalDocument) -> None:
+        """Guarda un documento en el LRU de documentos recientes."""
+        self._indexed_docs[source_id] = doc
+        self._indexed_docs.move_to_end(source_id)
+        if len(self._indexed_docs) > DOCUMENT_CACHE_SIZE:
+            self._indexed_docs.popitem(last=False)
     
     def get_index_stats(self, source_id: str) -> dict[str, Any]:
         """Obtiene estadísticas del índice."""
@@ -303,8 +582,8 @@ class ContextIndexer:
         index = self.get_index(source_id)
         stats = index.delete_source(source_id)
         
-        if source_id in self._indexed_docs:
-            del self._indexed_docs[source_id]
+        self._indexed_docs.pop(source_id, None)
+        self._search_cache.invalidate(source_id)
         
         return stats
     
@@ -327,8 +606,8 @@ class ContextIndexer:
             if index_path.exists():
                 self._safe_rmtree(index_path)
             
-            if source_id in self._indexed_docs:
-                del self._indexed_docs[source_id]
+            self._indexed_docs.pop(source_id, None)
+            self._search_cache.invalidate(source_id)
         else:
             # Cerrar todos los clientes
             for sid in list(self._index_cache.keys()):
@@ -339,6 +618,7 @@ class ContextIndexer:
                 self._safe_rmtree(self.db_path)
             
             self._indexed_docs.clear()
+            self._search_cache.invalidate()
     
     def _safe_rmtree(self, path: Path, max_retries: int = 3) -> bool:
         """
@@ -357,15 +637,18 @@ class ContextIndexer:
                 return True
             except PermissionError as e:
                 if attempt < max_retries - 1:
-                    print(f"[ContextIndexer] Reintentando cleanup ({attempt + 1}/{max_retries})...")
+                    logger.info(
+                        "[ContextIndexer] Reintentando cleanup (%d/%d)...",
+                        attempt + 1, max_retries,
+                    )
                     time.sleep(0.5 * (attempt + 1))  # Backoff exponencial
                 else:
                     # En el último intento, loguear pero no fallar
-                    print(f"[ContextIndexer] [WARN] No se pudo eliminar {path}: {e}")
-                    print("[ContextIndexer] Los archivos se sobrescribirán en la próxima indexación")
+                    logger.warning("[ContextIndexer] No se pudo eliminar %s: %s", path, e)
+                    logger.warning("[ContextIndexer] Los archivos se sobrescribirán en la próxima indexación")
                     return False
             except Exception as e:
-                print(f"[ContextIndexer] Error inesperado en cleanup: {e}")
+                logger.error("[ContextIndexer] Error inesperado en cleanup: %s", e)
                 return False
         
         return False
@@ -521,6 +804,24 @@ def index_content_for_rag(
     return indexer.index(source_id, text)
 
 
+def index_many_for_rag(
+    items: list[tuple[str, str, Optional[dict]]],
+    db_path: Path | str = DEFAULT_VECTOR_DB_DIR,
+) -> list[dict[str, Any]]:
+    """
+    Función de conveniencia para indexar varios documentos de una vez.
+    
+    Args:
+        items: Lista de (source_id, text, metadata)
+        db_path: Ruta del índice
+        
+    Returns:
+        Estadísticas de indexación por documento
+    """
+    indexer = ContextIndexer(db_path)
+    return indexer.index_many(items)
+
+
 def search_context(
     source_id: str,
     query: str,
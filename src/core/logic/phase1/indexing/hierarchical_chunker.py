@@ -17,6 +17,10 @@ from __future__ import annotations
 
 import hashlib
 import re
+from bisect import bisect_left
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, pairwise
 from dataclasses import dataclass, field
 from typing import Optional
 from enum import Enum
@@ -36,9 +40,14 @@ class BlockType(Enum):
     GENERIC = "generic"                      # Fallback
 
 
-@dataclass
+@dataclass(slots=True)
 class ChunkNode:
-    """Un chunk individual con su contexto jerárquico."""
+    """
+    Un chunk individual con su contexto jerárquico.
+    
+    Usa __slots__: un documento grande tiene miles de chunks y así se
+    evita un __dict__ por instancia.
+    """
     chunk_id: str
     content: str
     block_id: str
@@ -58,7 +67,7 @@ class ChunkNode:
         return self.position_in_block == self.total_in_block - 1
 
 
-@dataclass
+@dataclass(slots=True)
 class BlockNode:
     """Un bloque (idea completa) que contiene chunks."""
     block_id: str
@@ -80,12 +89,17 @@ class BlockNode:
 
 @dataclass
 class HierarchicalDocument:
-    """Documento completo con estructura jerárquica."""
+    """
+    Documento completo con estructura jerárquica.
+    
+    Los índices por ID se construyen una vez al crear el documento y
+    respaldan todas las consultas (padre, vecinos, hermanos) en O(1).
+    """
     source_id: str
     blocks: list[BlockNode]
     chunks: list[ChunkNode]
-    block_index: dict[str, BlockNode] = field(default_factory=dict)
-    chunk_index: dict[str, ChunkNode] = field(default_factory=dict)
+    block_index: dict[str, BlockNode] = field(init=False, repr=False, compare=False)
+    chunk_index: dict[str, ChunkNode] = field(init=False, repr=False, compare=False)
     
     def __post_init__(self):
         self.block_index = {b.block_id: b for b in self.blocks}
@@ -115,7 +129,12 @@ class HierarchicalDocument:
         block = self.block_index.get(chunk.block_id)
         if not block:
             return []
-        return [self.chunk_index[cid] for cid in block.chunk_ids if cid in self.chunk_index]
+        chunk_index = self.chunk_index
+        return [
+            sibling
+            for sibling in map(chunk_index.get, block.chunk_ids)
+            if sibling is not None
+        ]
 
 
 # =============================================================================
@@ -127,11 +146,54 @@ DEFAULT_CHUNK_OVERLAP = 150
 MIN_BLOCK_SIZE = 200
 MAX_BLOCK_SIZE = 4000
 
+# Chunking paralelo por bloques (opt-in con max_workers > 1)
+PARALLEL_MIN_BLOCKS = 10    # Por debajo, el coste de lanzar procesos no compensa
+PARALLEL_MAP_CHUNKSIZE = 8
+
 
 # =============================================================================
 # DETECCIÓN DE BLOQUES
 # =============================================================================
 
+# Línea de header markdown (para recorrer el documento)
+_RE_HEADER_LINE = re.compile(r'^#{1,4}\s+.+$', re.MULTILINE)
+# Header markdown en un fragmento ya aislado
+_RE_HEADER = re.compile(r'^(#{1,4})\s+(.+)$')
+# Separador de párrafos
+_RE_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+# Patrones de tipo de bloque
+_RE_BULLET_LIST = re.compile(r'^[\s]*[-*•]\s', re.MULTILINE)
+_RE_NUMBERED_LIST = re.compile(r'^[\s]*\d+[.)]\s', re.MULTILINE)
+_RE_SPEAKER = re.compile(r'^[A-Z][a-z]+:', re.MULTILINE)
+_RE_BRACKET_SPEAKER = re.compile(r'^\[.+?\]:', re.MULTILINE)
+# Limpieza de texto
+_RE_NEWLINES = re.compile(r'\n{3,}')
+_RE_WS = re.compile(r'[ \t]+')
+# '\r' suelto → '\n' (una pasada en C)
+_NL_TABLE = str.maketrans({'\r': '\n'})
+
+
+def _iter_split(
+    pattern: re.Pattern,
+    text: str,
+    keep_separators: bool = False,
+) -> Iterator[str]:
+    """
+    Equivalente perezoso de re.split: produce los fragmentos uno a uno
+    cortando `text` con finditer, sin materializar la lista completa.
+    
+    Con keep_separators también produce cada coincidencia, como hace
+    re.split con un grupo de captura.
+    """
+    prev_end = 0
+    for match in pattern.finditer(text):
+        yield text[prev_end:match.start()]
+        if keep_separators:
+            yield match.group(0)
+        prev_end = match.end()
+    yield text[prev_end:]
+
+
 def _generate_id(content: str, prefix: str, index: int) -> str:
     """Genera ID único basado en contenido."""
     hash_input = f"{content[:100]}_{index}"
@@ -148,21 +210,21 @@ def _detect_block_type(text: str) -> BlockType:
         return BlockType.CODE_BLOCK
     
     # Lista
-    if re.match(r'^[\s]*[-*•]\s', text_stripped, re.MULTILINE):
+    if _RE_BULLET_LIST.match(text_stripped):
         return BlockType.LIST_BLOCK
-    if re.match(r'^[\s]*\d+[.)]\s', text_stripped, re.MULTILINE):
+    if _RE_NUMBERED_LIST.match(text_stripped):
         return BlockType.LIST_BLOCK
     
     # Diálogo (patrones comunes de transcripción)
-    if re.search(r'^[A-Z][a-z]+:', text_stripped, re.MULTILINE):
+    if _RE_SPEAKER.search(text_stripped):
         return BlockType.DIALOGUE_BLOCK
-    if re.search(r'^\[.+?\]:', text_stripped, re.MULTILINE):
+    if _RE_BRACKET_SPEAKER.search(text_stripped):
         return BlockType.DIALOGUE_BLOCK
     
     return BlockType.GENERIC
 
 
-def _split_into_blocks(text: str) -> list[tuple[str, Optional[str], BlockType]]:
+def _split_into_blocks(text: str) -> Iterator[tuple[str, Optional[str], BlockType]]:
     """
     Divide el texto en bloques semánticos.
     
@@ -171,35 +233,34 @@ def _split_into_blocks(text: str) -> list[tuple[str, Optional[str], BlockType]]:
     2. Si no hay headers, divide por dobles saltos de línea
     3. Agrupa párrafos pequeños consecutivos
     
-    Returns:
-        Lista de (contenido, heading, tipo)
-    """
-    blocks = []
+    Es un generador: el caller construye cada bloque a medida que se
+    detecta, sin lista intermedia de tuplas.
     
-    # Patrón para headers markdown
-    header_pattern = r'^(#{1,4})\s+(.+)$'
+    Yields:
+        (contenido, heading, tipo)
+    """
+    emitted = 0
     
     # Intentar división por headers
-    header_splits = re.split(r'(^#{1,4}\s+.+$)', text, flags=re.MULTILINE)
-    
-    if len(header_splits) > 1:
+    if _RE_HEADER_LINE.search(text):
         # Hay headers, procesar por secciones
         current_heading = None
         current_content = []
         
-        for part in header_splits:
+        for part in _iter_split(_RE_HEADER_LINE, text, keep_separators=True):
             part = part.strip()
             if not part:
                 continue
             
-            header_match = re.match(header_pattern, part)
+            header_match = _RE_HEADER.match(part)
             if header_match:
                 # Guardar bloque anterior si existe
                 if current_content:
                     content = "\n\n".join(current_content)
                     if len(content) >= MIN_BLOCK_SIZE:
                         block_type = _detect_block_type(content)
-                        blocks.append((content, current_heading, block_type))
+                        yield content, current_heading, block_type
+                        emitted += 1
                     current_content = []
                 current_heading = header_match.group(2).strip()
             else:
@@ -210,16 +271,15 @@ def _split_into_blocks(text: str) -> list[tuple[str, Optional[str], BlockType]]:
             content = "\n\n".join(current_content)
             if len(content) >= MIN_BLOCK_SIZE // 2:
                 block_type = _detect_block_type(content)
-                blocks.append((content, current_heading, block_type))
+                yield content, current_heading, block_type
+                emitted += 1
     
     # Si no se detectaron bloques por headers, dividir por párrafos
-    if not blocks:
-        paragraphs = re.split(r'\n\s*\n', text)
-        
+    if not emitted:
         current_block = []
         current_size = 0
         
-        for para in paragraphs:
+        for para in _iter_split(_RE_PARAGRAPH_BREAK, text):
             para = para.strip()
             if not para:
                 continue
@@ -230,7 +290,8 @@ def _split_into_blocks(text: str) -> list[tuple[str, Optional[str], BlockType]]:
             if current_size + para_size > MAX_BLOCK_SIZE and current_block:
                 content = "\n\n".join(current_block)
                 block_type = _detect_block_type(content)
-                blocks.append((content, None, block_type))
+                yield content, None, block_type
+                emitted += 1
                 current_block = []
                 current_size = 0
             
@@ -241,7 +302,8 @@ def _split_into_blocks(text: str) -> list[tuple[str, Optional[str], BlockType]]:
             if current_size >= MIN_BLOCK_SIZE * 2:
                 content = "\n\n".join(current_block)
                 block_type = _detect_block_type(content)
-                blocks.append((content, None, block_type))
+                yield content, None, block_type
+                emitted += 1
                 current_block = []
                 current_size = 0
         
@@ -249,19 +311,54 @@ def _split_into_blocks(text: str) -> list[tuple[str, Optional[str], BlockType]]:
         if current_block:
             content = "\n\n".join(current_block)
             block_type = _detect_block_type(content)
-            blocks.append((content, None, block_type))
+            yield content, None, block_type
+            emitted += 1
     
     # Fallback: si aún no hay bloques, crear uno solo
-    if not blocks:
-        blocks.append((text, None, BlockType.GENERIC))
-    
-    return blocks
+    if not emitted:
+        yield text, None, BlockType.GENERIC
 
 
 # =============================================================================
 # CHUNKING DENTRO DE BLOQUES
 # =============================================================================
 
+def _compute_chunk_breaks(
+    sentence_lens: list[int],
+    chunk_size: int,
+    chunk_overlap: int,
+) -> list[tuple[int, int]]:
+    """
+    Calcula los cortes de chunks sobre las longitudes de las oraciones.
+    
+    Solo trabaja con enteros: cada chunk es un rango [inicio, fin) sobre
+    la lista de oraciones. El inicio del overlap se localiza con bisect
+    sobre las sumas prefijas, sin recorrer las oraciones hacia atrás.
+    
+    Returns:
+        Lista de (inicio, fin) por chunk
+    """
+    # prefix[k] = suma de longitudes de las primeras k oraciones
+    prefix = [0, *accumulate(sentence_lens)]
+    
+    breaks = []
+    start = 0
+    
+    for i in range(1, len(sentence_lens)):
+        # Si añadir esta oración excede el tamaño, cerrar chunk
+        if prefix[i + 1] - prefix[start] > chunk_size:
+            breaks.append((start, i))
+            
+            # Overlap: primeras oraciones finales cuya suma cabe en chunk_overlap
+            start = bisect_left(prefix, prefix[i] - chunk_overlap, start, i)
+    
+    # Último chunk
+    if len(sentence_lens) > start:
+        breaks.append((start, len(sentence_lens)))
+    
+    return breaks
+
+
 def _split_block_into_chunks(
     block_content: str,
     block_id: str,
@@ -290,73 +387,39 @@ def _split_block_into_chunks(
     
     # Dividir en oraciones para cortes más limpios
     sentences = re.split(r'(?<=[.!?])\s+', block_content)
+    sentence_lens = [len(s) for s in sentences]
     
-    current_chunk = []
-    current_size = 0
-    chunk_index = 0
-    char_position = 0
+    # Posición acumulada (+1 por el espacio) al inicio de cada oración
+    char_positions = [0, *accumulate(size + 1 for size in sentence_lens)]
     
-    for sentence in sentences:
-        sentence_size = len(sentence)
-        
-        # Si añadir esta oración excede el tamaño, cerrar chunk
-        if current_size + sentence_size > chunk_size and current_chunk:
-            chunk_content = " ".join(current_chunk)
-            chunk_id = _generate_id(chunk_content, "chk", chunk_index)
-            
-            chunk = ChunkNode(
-                chunk_id=chunk_id,
-                content=chunk_content,
-                block_id=block_id,
-                position_in_block=chunk_index,
-                total_in_block=0,  # Se actualizará después
-                char_start=char_position - len(chunk_content),
-                char_end=char_position,
-            )
-            chunks.append(chunk)
-            chunk_index += 1
-            
-            # Overlap: mantener las últimas oraciones
-            overlap_size = 0
-            overlap_sentences = []
-            for s in reversed(current_chunk):
-                if overlap_size + len(s) <= chunk_overlap:
-                    overlap_sentences.insert(0, s)
-                    overlap_size += len(s)
-                else:
-                    break
-            
-            current_chunk = overlap_sentences
-            current_size = overlap_size
-        
-        current_chunk.append(sentence)
-        current_size += sentence_size
-        char_position += sentence_size + 1  # +1 por el espacio
+    breaks = _compute_chunk_breaks(sentence_lens, chunk_size, chunk_overlap)
     
-    # Último chunk
-    if current_chunk:
-        chunk_content = " ".join(current_chunk)
+    # El contenido se une con " " y no se corta del bloque original: el
+    # separador normalizado forma parte del texto indexado y de su ID.
+    # Cada chunk se materializa una sola vez, con un join por rango.
+    for chunk_index, (start, end) in enumerate(breaks):
+        chunk_content = " ".join(sentences[start:end])
         chunk_id = _generate_id(chunk_content, "chk", chunk_index)
+        char_end = char_positions[end]
         
         chunk = ChunkNode(
             chunk_id=chunk_id,
             content=chunk_content,
             block_id=block_id,
             position_in_block=chunk_index,
-            total_in_block=0,
-            char_start=char_position - len(chunk_content),
-            char_end=char_position,
+            total_in_block=0,  # Se actualizará después
+            char_start=char_end - len(chunk_content),
+            char_end=char_end,
         )
         chunks.append(chunk)
     
-    # Actualizar total_in_block y enlaces prev/next
+    # Actualizar total_in_block y enlaces prev/next (pares consecutivos)
     total = len(chunks)
-    for i, chunk in enumerate(chunks):
+    for chunk in chunks:
         chunk.total_in_block = total
-        if i > 0:
-            chunk.prev_chunk_id = chunks[i - 1].chunk_id
-        if i < total - 1:
-            chunk.next_chunk_id = chunks[i + 1].chunk_id
+    for prev_chunk, chunk in pairwise(chunks):
+        chunk.prev_chunk_id = prev_chunk.chunk_id
+        prev_chunk.next_chunk_id = chunk.chunk_id
     
     return chunks
 
@@ -368,15 +431,22 @@ def _split_block_into_chunks(
 class HierarchicalChunker:
     """
     Chunker jerárquico que produce bloques y chunks con relaciones.
+    
+    Por defecto divide los bloques en serie (max_workers=1): el split
+    por regex es barato y un pool de procesos implica fork/spawn y
+    pickling. max_workers > 1 es opt-in, para documentos grandes en
+    procesos sin hilos activos.
     """
     
     def __init__(
         self,
         chunk_size: int = DEFAULT_CHUNK_SIZE,
         chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+        max_workers: int = 1,
     ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.max_workers = max_workers
     
     def chunk_document(
         self,
@@ -396,76 +466,97 @@ class HierarchicalChunker:
         # 1. Limpiar texto
         text = self._clean_text(text)
         
-        # 2. Dividir en bloques
-        raw_blocks = _split_into_blocks(text)
-        
-        # 3. Crear BlockNodes y ChunkNodes
-        blocks: list[BlockNode] = []
-        all_chunks: list[ChunkNode] = []
-        
-        for block_idx, (content, heading, block_type) in enumerate(raw_blocks):
-            block_id = _generate_id(content, "blk", block_idx)
-            
-            # Crear chunks para este bloque
-            chunks = _split_block_into_chunks(
-                content,
-                block_id,
-                self.chunk_size,
-                self.chunk_overlap,
-            )
-            
-            # Crear BlockNode
-            block = BlockNode(
-                block_id=block_id,
+        # 2. Dividir en bloques y crear BlockNodes en la misma pasada
+        blocks: list[BlockNode] = [
+            BlockNode(
+                block_id=_generate_id(content, "blk", block_idx),
                 content=content,
                 block_type=block_type,
                 heading=heading,
-                chunk_ids=[c.chunk_id for c in chunks],
                 position_in_doc=block_idx,
             )
-            
-            blocks.append(block)
-            all_chunks.extend(chunks)
+            for block_idx, (content, heading, block_type) in enumerate(_split_into_blocks(text))
+        ]
+        
+        # 3. Crear chunks de cada bloque (independientes entre sí)
+        chunks_per_block = self._split_blocks(
+            [block.content for block in blocks],
+            [block.block_id for block in blocks],
+        )
         
-        # 4. Enlazar bloques prev/next
-        for i, block in enumerate(blocks):
-            if i > 0:
-                block.prev_block_id = blocks[i - 1].block_id
-            if i < len(blocks) - 1:
-                block.next_block_id = blocks[i + 1].block_id
+        all_chunks: list[ChunkNode] = []
+        for block, chunks in zip(blocks, chunks_per_block):
+            block.chunk_ids = [c.chunk_id for c in chunks]
+            all_chunks.extend(chunks)
         
-        # 5. Enlazar chunks entre bloques (prev del primero → último del bloque anterior)
-        for i, block in enumerate(blocks):
-            if i > 0 and block.chunk_ids and blocks[i - 1].chunk_ids:
-                # Encontrar primer chunk de este bloque
-                first_chunk_id = block.chunk_ids[0]
-                # Encontrar último chunk del bloque anterior
-                last_chunk_id = blocks[i - 1].chunk_ids[-1]
-                
-                # Buscar y actualizar
-                for chunk in all_chunks:
-                    if chunk.chunk_id == first_chunk_id:
-                        chunk.prev_chunk_id = last_chunk_id
-                    elif chunk.chunk_id == last_chunk_id:
-                        chunk.next_chunk_id = first_chunk_id
+        # 4. Enlazar bloques consecutivos y, en la misma pasada, el último
+        #    chunk de cada bloque con el primero del siguiente (por posición:
+        #    sin índice por ID)
+        for (prev_block, prev_chunks), (block, chunks) in pairwise(
+            zip(blocks, chunks_per_block)
+        ):
+            block.prev_block_id = prev_block.block_id
+            prev_block.next_block_id = block.block_id
+            
+            if prev_chunks and chunks:
+                chunks[0].prev_chunk_id = prev_chunks[-1].chunk_id
+                prev_chunks[-1].next_chunk_id = chunks[0].chunk_id
         
-        # 6. Crear documento jerárquico
+        # 5. Crear documento jerárquico
         return HierarchicalDocument(
             source_id=source_id,
             blocks=blocks,
             chunks=all_chunks,
         )
     
+    def _split_blocks(
+        self,
+        contents: list[str],
+        block_ids: list[str],
+    ) -> list[list[ChunkNode]]:
+        """
+        Divide cada bloque en chunks; en paralelo solo si se pidió con
+        max_workers > 1 y hay suficientes bloques.
+        
+        El orden del resultado coincide con el de los bloques; el enlace
+        entre bloques se hace después, en un único proceso.
+        """
+        n = len(contents)
+        sizes = [self.chunk_size] * n
+        overlaps = [self.chunk_overlap] * n
+        
+        if n >= PARALLEL_MIN_BLOCKS and self.max_workers > 1:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                return list(executor.map(
+                    _split_block_into_chunks,
+                    contents,
+                    block_ids,
+                    sizes,
+                    overlaps,
+                    chunksize=PARALLEL_MAP_CHUNKSIZE,
+                ))
+        
+        return list(map(_split_block_into_chunks, contents, block_ids, sizes, overlaps))
+    
     def _clean_text(self, text: str) -> str:
         """Limpia y normaliza el texto."""
+        # Texto ya normalizado (p.ej. re-indexación): nada que sustituir
+        if (
+            '\r' not in text
+            and '\t' not in text
+            and '\n\n\n' not in text
+            and '  ' not in text
+        ):
+            return text.strip()
+        
         # Normalizar saltos de línea
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        text = text.replace('\r\n', '\n').translate(_NL_TABLE)
         
         # Reducir múltiples saltos a máximo 2
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = _RE_NEWLINES.sub('\n\n', text)
         
         # Reducir espacios múltiples
-        text = re.sub(r'[ \t]+', ' ', text)
+        text = _RE_WS.sub(' ', text)
         
         return text.strip()
 
@@ -24,13 +24,36 @@ from __future__ import annotations
 import json
 import os
 import shutil
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
+from itertools import islice
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Optional
 
+import numpy as np
 from dotenv import load_dotenv
 
+from core.logic.phase1.indexing.hierarchical_chunker import (
+    BlockNode,
+    BlockType,
+    ChunkNode,
+    HierarchicalDocument,
+)
+from core.logic.phase1.indexing.multi_granular_embedder import (
+    dequantize_int8,
+    quantize_int8_rows,
+)
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 load_dotenv()
 
 
@@ -38,16 +61,16 @@ load_dotenv()
 # ESTRUCTURAS DE DATOS
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True, kw_only=True)
 class IndexedChunk:
-    """Chunk almacenado en el índice."""
+    """Chunk almacenado en el índice (IDs vacíos como "", no None)."""
     chunk_id: str
     content: str
     block_id: str
     position_in_block: int
     total_in_block: int
-    prev_chunk_id: Optional[str]
-    next_chunk_id: Optional[str]
+    prev_chunk_id: str = ""
+    next_chunk_id: str = ""
     source_id: str
     
     def to_metadata(self) -> dict:
@@ -56,34 +79,35 @@ class IndexedChunk:
             "block_id": self.block_id,
             "position_in_block": self.position_in_block,
             "total_in_block": self.total_in_block,
-            "prev_chunk_id": self.prev_chunk_id or "",
-            "next_chunk_id": self.next_chunk_id or "",
+            "prev_chunk_id": self.prev_chunk_id,
+            "next_chunk_id": self.next_chunk_id,
             "source_id": self.source_id,
         }
 
 
-@dataclass
+@dataclass(slots=True, kw_only=True)
 class IndexedBlock:
-    """Bloque almacenado en el índice."""
+    """Bloque almacenado en el índice (campos vacíos como "", no None)."""
     block_id: str
     content: str
-    heading: Optional[str]
+    heading: str = ""
     block_type: str
     chunk_ids: list[str]
     position_in_doc: int
-    prev_block_id: Optional[str]
-    next_block_id: Optional[str]
+    prev_block_id: str = ""
+    next_block_id: str = ""
     source_id: str
     
     def to_metadata(self) -> dict:
         return {
             "block_id": self.block_id,
-            "heading": self.heading or "",
+            "heading": self.heading,
             "block_type": self.block_type,
-            "chunk_ids_json": json.dumps(self.chunk_ids),
+            "chunk_ids_csv": ",".join(self.chunk_ids),
+            "metadata_version": _METADATA_VERSION,
             "position_in_doc": self.position_in_doc,
-            "prev_block_id": self.prev_block_id or "",
-            "next_block_id": self.next_block_id or "",
+            "prev_block_id": self.prev_block_id,
+            "next_block_id": self.next_block_id,
             "source_id": self.source_id,
         }
 
@@ -106,6 +130,142 @@ DEFAULT_INDEX_DIR = Path("data/temp/hierarchical_index")
 CHUNKS_COLLECTION = "chunks"
 BLOCKS_COLLECTION = "blocks"
 
+# Tamaño de lote para add() en ChromaDB
+ADD_BATCH_SIZE = 200
+
+# Caché LRU de lecturas por ID (chunks y bloques)
+LOOKUP_CACHE_SIZE = 5000
+
+# Formato de metadata de bloques (2: chunk_ids separados por comas)
+_METADATA_VERSION = 2
+
+# Campos leídos de ChromaDB en consultas por ID
+FULL_INCLUDE = ("documents", "metadatas")
+METADATA_INCLUDE = ("metadatas",)
+
+# Cuantización int8 de chunks (archivo junto al índice)
+QUANTIZED_CHUNKS_FILE = "chunks_int8.npz"
+QUANTIZED_RERANK_FACTOR = 4     # Candidatos int8 por resultado final
+QUANTIZED_SCAN_BLOCK_ROWS = 2048  # Filas int8 convertidas a float32 a la vez
+
+
+# =============================================================================
+# UTILIDADES
+# =============================================================================
+
+def _as_float32(embeddings: list) -> np.ndarray:
+    """
+    Une los embeddings en una matriz float32 para ChromaDB.
+    
+    ChromaDB almacena float32; los vectores llegan como filas float32
+    (o float16 / códigos int8) del embedder, o como list[float].
+    """
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def _chunk_ids_from_metadata(metadata: dict) -> list[str]:
+    """
+    Lee los IDs de chunks de la metadata de un bloque.
+    
+    Versión 2 los guarda separados por comas (los IDs generados no
+    contienen comas); índices anteriores los guardan como JSON.
+    """
+    if metadata.get("metadata_version", 1) >= 2:
+        chunk_ids_csv = metadata.get("chunk_ids_csv", "")
+        return chunk_ids_csv.split(",") if chunk_ids_csv else []
+    
+    try:
+        return _json_loads(metadata.get("chunk_ids_json", "[]"))
+    except json.JSONDecodeError:
+        return []
+
+
+def _json_loads(data: str) -> Any:
+    """json.loads con orjson si está instalado (sus errores heredan de JSONDecodeError)."""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _lru_get(cache: OrderedDict, key: str):
+    """Lee de una caché LRU y marca la entrada como reciente."""
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache: OrderedDict, key: str, value, maxsize: int = LOOKUP_CACHE_SIZE) -> None:
+    """Inserta en una caché LRU, descartando la entrada más antigua."""
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > maxsize:
+        cache.popitem(last=False)
+
+
+def _iter_batches(
+    rows: Iterable[tuple[str, Any, str, dict]],
+    batch_size: int = ADD_BATCH_SIZE,
+) -> Iterator[tuple[list[str], np.ndarray, list[str], list[dict]]]:
+    """
+    Agrupa filas (id, embedding, documento, metadata) en lotes para add().
+    
+    Documentos grandes en un solo add() superan la ventana de lote
+    eficiente de ChromaDB (y su límite máximo de lote). Consume las
+    filas de forma perezosa: solo un lote vive en memoria a la vez.
+    """
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        ids, embeddings, documents, metadatas = zip(*batch)
+        yield list(ids), _as_float32(embeddings), list(documents), list(metadatas)
+
+
+def _iter_indexed_chunks(
+    hierarchical_doc: HierarchicalDocument,
+    doc_embeddings,
+) -> Iterator[tuple[str, Any, str, dict]]:
+    """Filas de la colección de chunks (solo chunks con embedding)."""
+    for chunk in hierarchical_doc.chunks:
+        chunk_emb = doc_embeddings.chunk_embeddings.get(chunk.chunk_id)
+        if not chunk_emb:
+            continue
+        
+        indexed = IndexedChunk(
+            chunk_id=chunk.chunk_id,
+            content=chunk.content,
+            block_id=chunk.block_id,
+            position_in_block=chunk.position_in_block,
+            total_in_block=chunk.total_in_block,
+            prev_chunk_id=chunk.prev_chunk_id or "",
+            next_chunk_id=chunk.next_chunk_id or "",
+            source_id=hierarchical_doc.source_id,
+        )
+        yield chunk.chunk_id, chunk_emb.chunk_embedding, chunk.content, indexed.to_metadata()
+
+
+def _iter_indexed_blocks(
+    hierarchical_doc: HierarchicalDocument,
+    doc_embeddings,
+) -> Iterator[tuple[str, Any, str, dict]]:
+    """Filas de la colección de bloques (solo bloques con embedding)."""
+    for block in hierarchical_doc.blocks:
+        block_emb = doc_embeddings.block_embeddings.get(block.block_id)
+        if block_emb is None or len(block_emb) == 0:
+            continue
+        
+        indexed = IndexedBlock(
+            block_id=block.block_id,
+            content=block.content,
+            heading=block.heading or "",
+            block_type=block.block_type.value,
+            chunk_ids=block.chunk_ids,
+            position_in_doc=block.position_in_doc,
+            prev_block_id=block.prev_block_id or "",
+            next_block_id=block.next_block_id or "",
+            source_id=hierarchical_doc.source_id,
+        )
+        yield block.block_id, block_emb, block.summary, indexed.to_metadata()
+
 
 # =============================================================================
 # ÍNDICE JERÁRQUICO
@@ -117,15 +277,29 @@ class HierarchicalIndex:
     
     Usa ChromaDB para almacenamiento vectorial con metadata
     que preserva la estructura del documento.
+    
+    Con `enable_quantization` guarda además una copia int8 de los
+    embeddings de chunks (4x menos memoria residente que float32). La
+    búsqueda de chunks la recorre por bloques de filas (exacta, sin
+    HNSW ni filtro `where`), toma los mejores k * 4 candidatos y los
+    re-ordena con los vectores float32 de ChromaDB.
+    
+    Con `parallel_writes` index_document escribe chunks y bloques desde
+    dos hilos: la preparación de una colección se solapa con el add()
+    de la otra (ChromaDB libera el GIL al escribir).
     """
     
     def __init__(
         self,
         base_path: Path | str = DEFAULT_INDEX_DIR,
         source_id: Optional[str] = None,
+        enable_quantization: bool = False,
+        parallel_writes: bool = False,
     ):
         self.base_path = Path(base_path)
         self.source_id = source_id
+        self.enable_quantization = enable_quantization
+        self.parallel_writes = parallel_writes
         
         # Path específico para esta fuente
         if source_id:
@@ -137,6 +311,22 @@ class HierarchicalIndex:
         self._chunks_collection = None
         self._blocks_collection = None
         self._embeddings = None
+        
+        # Lecturas por ID ya resueltas (LRU). El lock protege cachés y
+        # contadores: las búsquedas por faceta consultan desde varios hilos
+        self._chunk_cache: OrderedDict[str, SearchResult] = OrderedDict()
+        self._block_cache: OrderedDict[str, SearchResult] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # (ids, codes, scale por fila) de la copia int8
+        self._quantized: Optional[tuple[list[str], np.ndarray, np.ndarray]] = None
+    
+    @property
+    def quantized_path(self) -> Path:
+        """Archivo con los embeddings int8 de chunks."""
+        return self.index_path / QUANTIZED_CHUNKS_FILE
     
     @property
     def client(self):
@@ -183,6 +373,15 @@ class HierarchicalIndex:
             )
         return self._blocks_collection
     
+    def ensure_collections(self) -> tuple[Any, Any]:
+        """
+        Crea (si hace falta) ambas colecciones y las retorna (chunks, blocks).
+        
+        Llamar antes de compartir el índice entre hilos: la carga lazy
+        de las propiedades no está sincronizada.
+        """
+        return self.chunks_collection, self.blocks_collection
+    
     def index_document(
         self,
         hierarchical_doc,  # HierarchicalDocument
@@ -191,6 +390,14 @@ class HierarchicalIndex:
         """
         Indexa un documento jerárquico completo.
         
+        Cada colección recibe add() en lotes de ADD_BATCH_SIZE, generados
+        sobre la marcha (la memoria pico es un lote, no el documento): una
+        transacción (y un fsync del WAL de SQLite) por lote, no por chunk,
+        sin exceder el tamaño de lote de ChromaDB. ChromaDB >= 1.0
+        gestiona SQLite desde Rust y no expone la conexión, así que no
+        se pueden relajar los PRAGMA (journal_mode, synchronous) desde
+        aquí; agrupar escrituras es la palanca disponible.
+        
         Args:
             hierarchical_doc: Documento con estructura
             doc_embeddings: Embeddings pre-calculados
@@ -198,82 +405,101 @@ class HierarchicalIndex:
         Returns:
             Estadísticas de indexación
         """
-        # 1. Indexar chunks
-        chunk_ids = []
-        chunk_embeddings = []
-        chunk_documents = []
-        chunk_metadatas = []
-        
-        for chunk in hierarchical_doc.chunks:
-            chunk_emb = doc_embeddings.chunk_embeddings.get(chunk.chunk_id)
-            if not chunk_emb:
-                continue
+        if self.parallel_writes:
+            # Crear las colecciones antes de compartir el cliente entre hilos
+            chunks_collection, blocks_collection = self.ensure_collections()
             
-            indexed = IndexedChunk(
-                chunk_id=chunk.chunk_id,
-                content=chunk.content,
-                block_id=chunk.block_id,
-                position_in_block=chunk.position_in_block,
-                total_in_block=chunk.total_in_block,
-                prev_chunk_id=chunk.prev_chunk_id,
-                next_chunk_id=chunk.next_chunk_id,
-                source_id=hierarchical_doc.source_id,
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                chunks_future = executor.submit(
+                    self._index_chunks, hierarchical_doc, doc_embeddings, chunks_collection,
+                )
+                blocks_future = executor.submit(
+                    self._index_blocks, hierarchical_doc, doc_embeddings, blocks_collection,
+                )
+                chunks_indexed = chunks_future.result()
+                blocks_indexed = blocks_future.result()
+        else:
+            chunks_indexed = self._index_chunks(
+                hierarchical_doc, doc_embeddings, self.chunks_collection,
             )
-            
-            chunk_ids.append(chunk.chunk_id)
-            chunk_embeddings.append(chunk_emb.chunk_embedding)
-            chunk_documents.append(chunk.content)
-            chunk_metadatas.append(indexed.to_metadata())
-        
-        if chunk_ids:
-            self.chunks_collection.add(
-                ids=chunk_ids,
-                embeddings=chunk_embeddings,
-                documents=chunk_documents,
-                metadatas=chunk_metadatas,
+            blocks_indexed = self._index_blocks(
+                hierarchical_doc, doc_embeddings, self.blocks_collection,
             )
         
-        # 2. Indexar bloques
-        block_ids = []
-        block_embeddings = []
-        block_documents = []
-        block_metadatas = []
+        # Re-indexar puede cambiar chunks ya leídos
+        self.invalidate()
         
-        for block in hierarchical_doc.blocks:
-            block_emb = doc_embeddings.block_embeddings.get(block.block_id)
-            if not block_emb:
-                continue
-            
-            indexed = IndexedBlock(
-                block_id=block.block_id,
-                content=block.content,
-                heading=block.heading,
-                block_type=block.block_type.value,
-                chunk_ids=block.chunk_ids,
-                position_in_doc=block.position_in_doc,
-                prev_block_id=block.prev_block_id,
-                next_block_id=block.next_block_id,
-                source_id=hierarchical_doc.source_id,
+        return {
+            "chunks_indexed": chunks_indexed,
+            "blocks_indexed": blocks_indexed,
+            "source_id": hierarchical_doc.source_id,
+        }
+    
+    def _index_chunks(
+        self,
+        hierarchical_doc: HierarchicalDocument,
+        doc_embeddings,
+        collection,
+    ) -> int:
+        """
+        Escribe los chunks (y su copia int8 si aplica). Retorna cuántos.
+        
+        Cada lote se cuantiza al escribirlo: solo sus códigos int8 (y su
+        escala) sobreviven al lote, no los vectores float32. El archivo
+        int8 se reescribe una sola vez al final.
+        """
+        chunks_indexed = 0
+        quantized_ids: list[str] = []
+        quantized_codes: list[np.ndarray] = []
+        quantized_scales: list[np.ndarray] = []
+        
+        for ids, embeddings, documents, metadatas in _iter_batches(
+            _iter_indexed_chunks(hierarchical_doc, doc_embeddings)
+        ):
+            collection.add(
+                ids=ids,
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas,
             )
+            chunks_indexed += len(ids)
             
-            block_ids.append(block.block_id)
-            block_embeddings.append(block_emb)
-            block_documents.append(block.summary)
-            block_metadatas.append(indexed.to_metadata())
-        
-        if block_ids:
-            self.blocks_collection.add(
-                ids=block_ids,
-                embeddings=block_embeddings,
-                documents=block_documents,
-                metadatas=block_metadatas,
+            if self.enable_quantization:
+                codes, scale = self._quantize_chunk_rows(embeddings)
+                quantized_ids.extend(ids)
+                quantized_codes.append(codes)
+                quantized_scales.append(scale)
+        
+        if quantized_ids:
+            self._append_quantized_codes(
+                quantized_ids,
+                np.concatenate(quantized_codes),
+                np.concatenate(quantized_scales),
             )
         
-        return {
-            "chunks_indexed": len(chunk_ids),
-            "blocks_indexed": len(block_ids),
-            "source_id": hierarchical_doc.source_id,
-        }
+        return chunks_indexed
+    
+    def _index_blocks(
+        self,
+        hierarchical_doc: HierarchicalDocument,
+        doc_embeddings,
+        collection,
+    ) -> int:
+        """Escribe los bloques. Retorna cuántos."""
+        blocks_indexed = 0
+        
+        for ids, embeddings, documents, metadatas in _iter_batches(
+            _iter_indexed_blocks(hierarchical_doc, doc_embeddings)
+        ):
+            collection.add(
+                ids=ids,
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas,
+            )
+            blocks_indexed += len(ids)
+        
+        return blocks_indexed
     
     def search_chunks(
         self,
@@ -292,6 +518,12 @@ class HierarchicalIndex:
         Returns:
             Lista de SearchResult
         """
+        # La copia int8 solo contiene chunks de este índice
+        if self.enable_quantization and filter_source in (None, self.source_id):
+            quantized_results = self._search_chunks_quantized(query_embedding, k)
+            if quantized_results is not None:
+                return quantized_results
+        
         where_filter = None
         if filter_source:
             where_filter = {"source_id": filter_source}
@@ -352,47 +584,111 @@ class HierarchicalIndex:
         blocks = self.search_blocks(query_embedding, k_blocks, filter_source)
         return chunks, blocks
     
-    def get_chunk_by_id(self, chunk_id: str) -> Optional[SearchResult]:
-        """Obtiene un chunk por ID."""
-        try:
-            result = self.chunks_collection.get(
-                ids=[chunk_id],
-                include=["documents", "metadatas"],
-            )
-            if result["ids"]:
-                return SearchResult(
-                    id=result["ids"][0],
-                    content=result["documents"][0] if result["documents"] else "",
-                    score=1.0,
-                    metadata=result["metadatas"][0] if result["metadatas"] else {},
-                    granularity="chunk",
-                )
-        except Exception:
-            pass
-        return None
+    def get_chunk_by_id(
+        self,
+        chunk_id: str,
+        include: tuple[str, ...] = FULL_INCLUDE,
+    ) -> Optional[SearchResult]:
+        """
+        Obtiene un chunk por ID.
+        
+        Con include=("metadatas",) no se lee el texto del chunk (content
+        queda vacío salvo que ya estuviera en caché).
+        """
+        return self.get_chunks_by_ids([chunk_id], include).get(chunk_id)
     
-    def get_block_by_id(self, block_id: str) -> Optional[SearchResult]:
-        """Obtiene un bloque por ID."""
+    def get_block_by_id(
+        self,
+        block_id: str,
+        include: tuple[str, ...] = FULL_INCLUDE,
+    ) -> Optional[SearchResult]:
+        """Obtiene un bloque por ID (ver `include` en get_chunk_by_id)."""
+        return self.get_blocks_by_ids([block_id], include).get(block_id)
+    
+    def get_chunks_by_ids(
+        self,
+        chunk_ids: list[str],
+        include: tuple[str, ...] = FULL_INCLUDE,
+    ) -> dict[str, SearchResult]:
+        """Obtiene varios chunks con una sola consulta (id → chunk)."""
+        return self._get_by_ids(
+            self.chunks_collection, chunk_ids, "chunk", self._chunk_cache, include,
+        )
+    
+    def get_blocks_by_ids(
+        self,
+        block_ids: list[str],
+        include: tuple[str, ...] = FULL_INCLUDE,
+    ) -> dict[str, SearchResult]:
+        """Obtiene varios bloques con una sola consulta (id → bloque)."""
+        return self._get_by_ids(
+            self.blocks_collection, block_ids, "block", self._block_cache, include,
+        )
+    
+    def _get_by_ids(
+        self,
+        collection,
+        ids: list[Optional[str]],
+        granularity: str,
+        cache: OrderedDict[str, SearchResult],
+        include: tuple[str, ...] = FULL_INCLUDE,
+    ) -> dict[str, SearchResult]:
+        """
+        Consulta multi-ID; ignora IDs vacíos o repetidos y usa la caché.
+        
+        Solo se cachean resultados completos (con documento).
+        """
+        unique_ids = list(dict.fromkeys(i for i in ids if i))
+        
+        found = {}
+        missing = []
+        with self._cache_lock:
+            for doc_id in unique_ids:
+                cached = _lru_get(cache, doc_id)
+                if cached:
+                    found[doc_id] = cached
+                else:
+                    missing.append(doc_id)
+            
+            self.cache_hits += len(found)
+            self.cache_misses += len(missing)
+        
+        if not missing:
+            return found
+        
         try:
-            result = self.blocks_collection.get(
-                ids=[block_id],
-                include=["documents", "metadatas"],
+            result = collection.get(
+                ids=missing,
+                include=list(include),
             )
-            if result["ids"]:
-                return SearchResult(
-                    id=result["ids"][0],
-                    content=result["documents"][0] if result["documents"] else "",
-                    score=1.0,
-                    metadata=result["metadatas"][0] if result["metadatas"] else {},
-                    granularity="block",
-                )
         except Exception:
-            pass
-        return None
+            return found
+        
+        documents = result.get("documents") or []
+        metadatas = result.get("metadatas") or []
+        complete = "documents" in include
+        
+        fetched = {}
+        for i, doc_id in enumerate(result["ids"]):
+            fetched[doc_id] = SearchResult(
+                id=doc_id,
+                content=documents[i] if i < len(documents) else "",
+                score=1.0,
+                metadata=metadatas[i] if i < len(metadatas) else {},
+                granularity=granularity,
+            )
+        
+        if complete:
+            with self._cache_lock:
+                for doc_id, item in fetched.items():
+                    _lru_put(cache, doc_id, item)
+        
+        found.update(fetched)
+        return found
     
     def get_parent_block(self, chunk_id: str) -> Optional[SearchResult]:
         """Obtiene el bloque padre de un chunk."""
-        chunk = self.get_chunk_by_id(chunk_id)
+        chunk = self.get_chunk_by_id(chunk_id, include=METADATA_INCLUDE)
         if chunk and chunk.metadata.get("block_id"):
             return self.get_block_by_id(chunk.metadata["block_id"])
         return None
@@ -412,64 +708,123 @@ class HierarchicalIndex:
         Returns:
             Lista ordenada de chunks [prev..., current, ...next]
         """
-        neighbors = []
-        
         chunk = self.get_chunk_by_id(chunk_id)
         if not chunk:
-            return neighbors
+            return []
         
-        # Navegar hacia atrás
+        # Avanzar en ambas direcciones a la vez: una consulta por paso,
+        # solo metadata (los punteros prev/next)
         prev_ids = []
-        current_id = chunk.metadata.get("prev_chunk_id")
+        next_ids = []
+        prev_id = chunk.metadata.get("prev_chunk_id")
+        next_id = chunk.metadata.get("next_chunk_id")
         for _ in range(window):
-            if not current_id:
+            if not prev_id and not next_id:
                 break
-            prev_chunk = self.get_chunk_by_id(current_id)
+            found = self.get_chunks_by_ids([prev_id, next_id], include=METADATA_INCLUDE)
+            
+            prev_chunk = found.get(prev_id) if prev_id else None
             if prev_chunk:
-                prev_ids.insert(0, prev_chunk)
-                current_id = prev_chunk.metadata.get("prev_chunk_id")
+                prev_ids.append(prev_id)
+                prev_id = prev_chunk.metadata.get("prev_chunk_id")
             else:
-                break
-        
-        neighbors.extend(prev_ids)
-        neighbors.append(chunk)
-        
-        # Navegar hacia adelante
-        current_id = chunk.metadata.get("next_chunk_id")
-        for _ in range(window):
-            if not current_id:
-                break
-            next_chunk = self.get_chunk_by_id(current_id)
+                prev_id = None
+            
+            next_chunk = found.get(next_id) if next_id else None
             if next_chunk:
-                neighbors.append(next_chunk)
-                current_id = next_chunk.metadata.get("next_chunk_id")
+                next_ids.append(next_id)
+                next_id = next_chunk.metadata.get("next_chunk_id")
             else:
-                break
+                next_id = None
         
-        return neighbors
+        # Materializar el contenido de los vecinos en una sola consulta
+        prev_ids.reverse()
+        neighbors = self.get_chunks_by_ids(prev_ids + next_ids)
+        
+        return (
+            [neighbors[cid] for cid in prev_ids if cid in neighbors]
+            + [chunk]
+            + [neighbors[cid] for cid in next_ids if cid in neighbors]
+        )
     
     def get_block_chunks(self, block_id: str) -> list[SearchResult]:
         """Obtiene todos los chunks de un bloque."""
-        block = self.get_block_by_id(block_id)
+        block = self.get_block_by_id(block_id, include=METADATA_INCLUDE)
         if not block:
             return []
         
-        chunk_ids_json = block.metadata.get("chunk_ids_json", "[]")
-        try:
-            chunk_ids = json.loads(chunk_ids_json)
-        except json.JSONDecodeError:
+        chunk_ids = _chunk_ids_from_metadata(block.metadata)
+        if not chunk_ids:
             return []
         
-        chunks = []
-        for cid in chunk_ids:
-            chunk = self.get_chunk_by_id(cid)
-            if chunk:
-                chunks.append(chunk)
+        # Una sola consulta para todos los chunks del bloque
+        found = self.get_chunks_by_ids(chunk_ids)
+        chunks = [found[cid] for cid in chunk_ids if cid in found]
         
         # Ordenar por posición
         chunks.sort(key=lambda c: c.metadata.get("position_in_block", 0))
         return chunks
     
+    def load_document(self, source_id: str) -> Optional[HierarchicalDocument]:
+        """
+        Reconstruye un HierarchicalDocument desde la metadata del índice.
+        
+        Reconstrucción ligera: los bloques guardan su resumen (no el
+        contenido completo) y los chunks no conservan char_start/char_end.
+        La jerarquía (padres, vecinos, orden) sí es exacta.
+        
+        Returns:
+            HierarchicalDocument, o None si la fuente no está indexada
+        """
+        chunk_results = self.chunks_collection.get(
+            where={"source_id": source_id},
+            include=["documents", "metadatas"],
+        )
+        if not chunk_results["ids"]:
+            return None
+        
+        block_results = self.blocks_collection.get(
+            where={"source_id": source_id},
+            include=["documents", "metadatas"],
+        )
+        
+        blocks = []
+        for content, meta in zip(block_results["documents"], block_results["metadatas"]):
+            chunk_ids = _chunk_ids_from_metadata(meta)
+            
+            blocks.append(BlockNode(
+                block_id=meta["block_id"],
+                content=content or "",
+                block_type=BlockType(meta.get("block_type", BlockType.GENERIC.value)),
+                heading=meta.get("heading") or None,
+                chunk_ids=chunk_ids,
+                position_in_doc=meta.get("position_in_doc", 0),
+                prev_block_id=meta.get("prev_block_id") or None,
+                next_block_id=meta.get("next_block_id") or None,
+            ))
+        blocks.sort(key=lambda b: b.position_in_doc)
+        
+        block_positions = {b.block_id: b.position_in_doc for b in blocks}
+        chunks = [
+            ChunkNode(
+                chunk_id=meta["chunk_id"],
+                content=content or "",
+                block_id=meta["block_id"],
+                position_in_block=meta.get("position_in_block", 0),
+                total_in_block=meta.get("total_in_block", 1),
+                prev_chunk_id=meta.get("prev_chunk_id") or None,
+                next_chunk_id=meta.get("next_chunk_id") or None,
+            )
+            for content, meta in zip(chunk_results["documents"], chunk_results["metadatas"])
+        ]
+        chunks.sort(key=lambda c: (block_positions.get(c.block_id, 0), c.position_in_block))
+        
+        return HierarchicalDocument(
+            source_id=source_id,
+            blocks=blocks,
+            chunks=chunks,
+        )
+    
     def delete_source(self, source_id: str) -> dict[str, int]:
         """
         Elimina todos los datos de una fuente.
@@ -493,22 +848,38 @@ class HierarchicalIndex:
         if chunk_results["ids"]:
             self.chunks_collection.delete(ids=chunk_results["ids"])
             chunks_deleted = len(chunk_results["ids"])
+            self._drop_quantized_chunks(chunk_results["ids"])
         
         if block_results["ids"]:
             self.blocks_collection.delete(ids=block_results["ids"])
             blocks_deleted = len(block_results["ids"])
         
+        self.invalidate()
+        
         return {
             "chunks_deleted": chunks_deleted,
             "blocks_deleted": blocks_deleted,
         }
     
+    def invalidate(self) -> None:
+        """Vacía las cachés de lecturas por ID (los contadores se conservan)."""
+        with self._cache_lock:
+            self._chunk_cache.clear()
+            self._block_cache.clear()
+    
     def get_stats(self) -> dict[str, Any]:
         """Obtiene estadísticas del índice."""
+        with self._cache_lock:
+            cache_stats = {
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "cached_results": len(self._chunk_cache) + len(self._block_cache),
+            }
         return {
             "chunks_count": self.chunks_collection.count(),
             "blocks_count": self.blocks_collection.count(),
             "index_path": str(self.index_path),
+            **cache_stats,
         }
     
     def cleanup(self):
@@ -518,6 +889,155 @@ class HierarchicalIndex:
         self._client = None
         self._chunks_collection = None
         self._blocks_collection = None
+        self._quantized = None
+        self.invalidate()
+    
+    def _load_quantized(self):
+        """
+        Carga (una vez) la copia int8 de los chunks, si existe.
+        
+        Archivos anteriores (escala por columna, con zero_point) se
+        convierten una vez a escala por fila.
+        """
+        if self._quantized is None and self.quantized_path.exists():
+            with np.load(self.quantized_path) as data:
+                ids = data["ids"].tolist()
+                if "zero_point" in data:
+                    codes, scale = quantize_int8_rows(
+                        dequantize_int8(data["codes"], data["scale"], data["zero_point"])
+                    )
+                else:
+                    codes, scale = data["codes"], data["scale"]
+            self._quantized = (ids, codes, scale)
+        return self._quantized
+    
+    def _save_quantized(self, ids: list[str], codes: np.ndarray, scale: np.ndarray) -> None:
+        """Persiste la copia int8 de los chunks (la borra si queda vacía)."""
+        if not ids:
+            if self.quantized_path.exists():
+                self.quantized_path.unlink()
+            self._quantized = None
+            return
+        
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            self.quantized_path,
+            ids=np.asarray(ids),
+            codes=codes,
+            scale=scale,
+        )
+        self._quantized = (list(ids), codes, scale)
+    
+    @staticmethod
+    def _quantize_chunk_rows(embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Códigos int8 y escala por fila de embeddings de chunks.
+        
+        Las filas se normalizan antes de cuantizar para que el producto
+        punto aproximado ordene igual que la similitud coseno.
+        """
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return quantize_int8_rows(embeddings / np.where(norms == 0, 1, norms))
+    
+    def _write_quantized_chunks(self, ids: list[str], embeddings: np.ndarray) -> None:
+        """Cuantiza y añade chunks a la copia int8."""
+        self._append_quantized_codes(ids, *self._quantize_chunk_rows(embeddings))
+    
+    def _append_quantized_codes(
+        self,
+        ids: list[str],
+        new_codes: np.ndarray,
+        new_scale: np.ndarray,
+    ) -> None:
+        """
+        Añade filas ya cuantizadas a la copia int8 y la persiste.
+        
+        La escala es por fila: las filas existentes se copian tal cual
+        (sin re-cuantizar ni acumular error); las de IDs re-escritos se
+        sustituyen.
+        """
+        existing = self._load_quantized()
+        if existing is not None:
+            old_ids, codes, scale = existing
+            new_ids = set(ids)
+            keep = [i for i, cid in enumerate(old_ids) if cid not in new_ids]
+            ids = [old_ids[i] for i in keep] + list(ids)
+            new_codes = np.concatenate([codes[keep], new_codes])
+            new_scale = np.concatenate([scale[keep], new_scale])
+        
+        self._save_quantized(list(ids), new_codes, new_scale)
+    
+    def _drop_quantized_chunks(self, ids: list[str]) -> None:
+        """Elimina chunks de la copia int8."""
+        existing = self._load_quantized()
+        if existing is None:
+            return
+        
+        old_ids, codes, scale = existing
+        removed = set(ids)
+        keep = [i for i, cid in enumerate(old_ids) if cid not in removed]
+        if len(keep) == len(old_ids):
+            return
+        
+        self._save_quantized([old_ids[i] for i in keep], codes[keep], scale[keep])
+    
+    def _search_chunks_quantized(
+        self,
+        query_embedding: list[float],
+        k: int,
+    ) -> Optional[list[SearchResult]]:
+        """
+        Búsqueda sobre la copia int8 con re-ranking float32.
+        
+        Returns:
+            Lista de SearchResult, o None si no hay copia int8
+        """
+        quantized = self._load_quantized()
+        if quantized is None:
+            return None
+        
+        ids, codes, scale = quantized
+        query = np.asarray(query_embedding, dtype=np.float32)
+        
+        # q·x ≈ (codes·q) * scale, por bloques: codes @ query entero
+        # crearía una copia float32 [N, D] del corpus en cada consulta
+        approx = np.empty(len(ids), dtype=np.float32)
+        for start in range(0, len(ids), QUANTIZED_SCAN_BLOCK_ROWS):
+            block = codes[start:start + QUANTIZED_SCAN_BLOCK_ROWS]
+            approx[start:start + len(block)] = block.astype(np.float32) @ query
+        approx *= scale
+        
+        n_candidates = min(len(ids), k * QUANTIZED_RERANK_FACTOR)
+        if n_candidates <= 0:
+            return []
+        top = np.argpartition(-approx, n_candidates - 1)[:n_candidates]
+        
+        # Re-ranking exacto con los vectores float32 de ChromaDB
+        raw = self.chunks_collection.get(
+            ids=[ids[i] for i in top],
+            include=["documents", "metadatas", "embeddings"],
+        )
+        if not raw["ids"]:
+            return []
+        
+        vectors = np.asarray(raw["embeddings"], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        norms = np.where(norms == 0, 1, norms)  # Evitar división por 0
+        scores = (vectors @ query) / norms
+        
+        documents = raw["documents"] or []
+        metadatas = raw["metadatas"] or []
+        
+        return [
+            SearchResult(
+                id=raw["ids"][i],
+                content=documents[i] if i < len(documents) else "",
+                score=float(scores[i]),
+                metadata=metadatas[i] if i < len(metadatas) else {},
+                granularity="chunk",
+            )
+            for i in np.argsort(-scores)[:k]
+        ]
     
     def _parse_results(
         self,
@@ -525,30 +1045,30 @@ class HierarchicalIndex:
         granularity: str,
     ) -> list[SearchResult]:
         """Parsea resultados de ChromaDB a SearchResult."""
-        results = []
-        
         if not raw_results["ids"] or not raw_results["ids"][0]:
-            return results
+            return []
         
         ids = raw_results["ids"][0]
         documents = raw_results.get("documents", [[]])[0]
         metadatas = raw_results.get("metadatas", [[]])[0]
         distances = raw_results.get("distances", [[]])[0]
         
-        for i, doc_id in enumerate(ids):
-            # ChromaDB retorna distancia, convertir a score (1 - distancia para coseno)
-            distance = distances[i] if i < len(distances) else 0
-            score = 1 - distance  # Cosine distance → similarity
-            
-            results.append(SearchResult(
+        n_distances = len(distances)
+        n_documents = len(documents)
+        n_metadatas = len(metadatas)
+        
+        # ChromaDB retorna distancia coseno: score = 1 - distancia
+        # (distancia 0 para los IDs sin distancia)
+        return [
+            SearchResult(
                 id=doc_id,
-                content=documents[i] if i < len(documents) else "",
-                score=score,
-                metadata=metadatas[i] if i < len(metadatas) else {},
+                content=documents[i] if i < n_documents else "",
+                score=1 - (distances[i] if i < n_distances else 0),
+                metadata=metadatas[i] if i < n_metadatas else {},
                 granularity=granularity,
-            ))
-        
-        return results
+            )
+            for i, doc_id in enumerate(ids)
+        ]
 
 
 # =============================================================================
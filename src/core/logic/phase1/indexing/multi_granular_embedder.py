@@ -16,8 +16,14 @@ Esto permite:
 
 from __future__ import annotations
 
+import hashlib
+import math
 import os
-from dataclasses import dataclass
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Optional
 import numpy as np
 
@@ -42,21 +48,45 @@ class EmbeddingResult:
 
 @dataclass
 class ChunkEmbeddings:
-    """Embeddings completos de un chunk."""
+    """Embeddings completos de un chunk (filas np.ndarray, float32 por defecto)."""
     chunk_id: str
-    chunk_embedding: list[float]
-    block_embedding: Optional[list[float]] = None
-    contextualized_embedding: Optional[list[float]] = None
+    chunk_embedding: np.ndarray
+    block_embedding: Optional[np.ndarray] = None
+    contextualized_embedding: Optional[np.ndarray] = None
+
+
+def _empty_matrix() -> np.ndarray:
+    return np.empty((0, 0), dtype=np.float32)
 
 
 @dataclass
 class DocumentEmbeddings:
-    """Todos los embeddings de un documento."""
+    """
+    Todos los embeddings de un documento.
+    
+    Los vectores viven en dos matrices contiguas [N, D] (chunks y
+    bloques) con un índice id → fila; los dicts por ID exponen vistas
+    de esas mismas filas, sin copias.
+    """
     source_id: str
     chunk_embeddings: dict[str, ChunkEmbeddings]
-    block_embeddings: dict[str, list[float]]
+    block_embeddings: dict[str, np.ndarray]
     embedding_model: str
     embedding_dim: int
+    chunk_matrix: np.ndarray = field(default_factory=_empty_matrix, repr=False)
+    chunk_id_to_row: dict[str, int] = field(default_factory=dict, repr=False)
+    block_matrix: np.ndarray = field(default_factory=_empty_matrix, repr=False)
+    block_id_to_row: dict[str, int] = field(default_factory=dict, repr=False)
+    
+    def chunk_vectors(self, chunk_ids: list[str]) -> np.ndarray:
+        """Filas de chunk_matrix de los IDs dados (un solo fancy-index)."""
+        rows = [self.chunk_id_to_row[chunk_id] for chunk_id in chunk_ids]
+        return self.chunk_matrix[rows]
+    
+    def block_vectors(self, block_ids: list[str]) -> np.ndarray:
+        """Filas de block_matrix de los IDs dados (un solo fancy-index)."""
+        rows = [self.block_id_to_row[block_id] for block_id in block_ids]
+        return self.block_matrix[rows]
 
 
 # =============================================================================
@@ -70,10 +100,71 @@ EMBEDDING_DIMENSIONS = {
     "text-embedding-ada-002": 1536,
 }
 
+# Tipos admitidos para guardar embeddings normalizados en memoria
+# (None = float32 tal como llega de la API, sin normalizar)
+SUPPORTED_EMBEDDING_DTYPES = ("float32", "float16", "int8")
+
 # Límite de tokens por request (modelo small)
 MAX_TOKENS_PER_BATCH = 8000
 APPROX_CHARS_PER_TOKEN = 4
 
+# Requests de embeddings simultáneos (respetar rate limits)
+EMBEDDING_MAX_CONCURRENCY = 4
+
+# Cache de embeddings por contenido (compartida en el proceso)
+EMBEDDING_CACHE_SIZE = 8192     # Vectores float32: ~50 MB a 1536 dims
+
+
+# =============================================================================
+# CACHE DE EMBEDDINGS
+# =============================================================================
+
+class _EmbeddingCache:
+    """
+    Cache LRU de embeddings direccionada por contenido.
+    
+    Clave: (modelo, BLAKE2b del texto). Un mismo texto (boilerplate,
+    encabezados, documentos re-indexados) solo se envía a la API una
+    vez por proceso. Los vectores se guardan en float32 y el acceso
+    está protegido con un lock (los batches se envían desde hilos).
+    """
+    
+    def __init__(self, maxsize: int = EMBEDDING_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[str, bytes], np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(model: str, text: str) -> tuple[str, bytes]:
+        return (model, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+    
+    def get_many(self, keys: list[tuple[str, bytes]]) -> list[Optional[np.ndarray]]:
+        """Vectores cacheados (None si no están), en el orden de `keys`."""
+        with self._lock:
+            found = []
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                found.append(vector)
+            return found
+    
+    def put_many(self, items: list[tuple[tuple[str, bytes], np.ndarray]]) -> None:
+        """Guarda vectores nuevos, descartando los más antiguos."""
+        with self._lock:
+            for key, vector in items:
+                self._entries[key] = np.asarray(vector, dtype=np.float32)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_embedding_cache = _EmbeddingCache()
+
 
 # =============================================================================
 # EMBEDDER BASE
@@ -87,17 +178,40 @@ class MultiGranularEmbedder:
     - Embeddings individuales de chunks
     - Embeddings de bloques padre
     - Embeddings contextualizados (chunk + padre)
-    - Batch processing para eficiencia
+    - Batch processing para eficiencia (batches en paralelo)
+    
+    Los embeddings que van al índice se guardan como filas de una
+    matriz float32 contigua (no como list[float]: ~7x menos memoria).
+    
+    Con `embedding_dtype="float16"` los vectores se normalizan y se
+    guardan como filas de una matriz float16: la mitad de memoria que
+    float32 mientras esperan a ser escritos en el índice. La similitud
+    coseno sobre vectores normalizados apenas cambia con esa precisión.
+    
+    Con `embedding_dtype="int8"` cada vector normalizado se cuantiza con
+    su propia escala (max|v| / 127): 4x menos memoria que float32. Solo
+    se guardan los códigos; la escala de cada fila no afecta al coseno
+    (índice, copia int8 y rankings normalizan), así que se descarta.
     """
     
     def __init__(
         self,
         model: str = DEFAULT_EMBEDDING_MODEL,
         api_key: Optional[str] = None,
+        embedding_dtype: Optional[str] = None,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
     ):
+        if embedding_dtype is not None and embedding_dtype not in SUPPORTED_EMBEDDING_DTYPES:
+            raise ValueError(
+                f"embedding_dtype no soportado: {embedding_dtype}. "
+                f"Opciones: {', '.join(SUPPORTED_EMBEDDING_DTYPES)}"
+            )
+        
         self.model = model
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.embedding_dim = EMBEDDING_DIMENSIONS.get(model, 1536)
+        self.embedding_dtype = embedding_dtype
+        self.max_concurrency = max_concurrency
         
         self._embeddings_client = None
     
@@ -137,7 +251,84 @@ class MultiGranularEmbedder:
         Returns:
             DocumentEmbeddings con todos los embeddings
         """
-        # 1. Preparar textos para batch embedding
+        return self.embed_documents([hierarchical_doc], include_contextualized)[0]
+    
+    def embed_documents(
+        self,
+        hierarchical_docs: list,  # list[HierarchicalDocument]
+        include_contextualized: bool = True,
+    ) -> list[DocumentEmbeddings]:
+        """
+        Genera los embeddings de varios documentos compartiendo batches.
+        
+        Los textos de todos los documentos (chunks, bloques y
+        contextualizados) se concatenan en un solo flujo antes de llamar
+        a la API, así los batches se llenan aunque cada documento o grupo
+        sea pequeño. Después se reparten por grupo y por documento.
+        
+        Args:
+            hierarchical_docs: Documentos con estructura jerárquica
+            include_contextualized: Si generar embeddings chunk+contexto
+            
+        Returns:
+            Lista de DocumentEmbeddings, en el mismo orden
+        """
+        # 1. Preparar textos de cada documento
+        prepared = [
+            self._prepare_texts(doc, include_contextualized)
+            for doc in hierarchical_docs
+        ]
+        
+        # 2. Generar embeddings en un único flujo de batches:
+        #    chunks + bloques + contextualizados de todos los documentos
+        all_chunk_texts = [text for p in prepared for text in p["chunk_texts"]]
+        all_block_texts = [text for p in prepared for text in p["block_texts"]]
+        all_contextualized_texts = []
+        if include_contextualized:
+            all_contextualized_texts = [
+                text for p in prepared for text in p["contextualized_texts"]
+            ]
+        
+        all_embeds = self._for_storage(self._embed_matrix(
+            all_chunk_texts + all_block_texts + all_contextualized_texts
+        ))
+        
+        n_all_chunks = len(all_chunk_texts)
+        n_all_blocks = len(all_block_texts)
+        all_chunk_embeds = all_embeds[:n_all_chunks]
+        all_block_embeds = all_embeds[n_all_chunks:n_all_chunks + n_all_blocks]
+        all_contextualized_embeds = all_embeds[n_all_chunks + n_all_blocks:]
+        
+        # 3. Repartir por documento
+        results = []
+        chunk_offset = block_offset = ctx_offset = 0
+        
+        for doc, p in zip(hierarchical_docs, prepared):
+            n_chunks = len(p["chunk_texts"])
+            n_blocks = len(p["block_texts"])
+            n_ctx = len(p["contextualized_texts"])
+            
+            results.append(self._build_document_embeddings(
+                doc,
+                p,
+                all_chunk_embeds[chunk_offset:chunk_offset + n_chunks],
+                all_block_embeds[block_offset:block_offset + n_blocks],
+                all_contextualized_embeds[ctx_offset:ctx_offset + n_ctx],
+                include_contextualized,
+            ))
+            
+            chunk_offset += n_chunks
+            block_offset += n_blocks
+            ctx_offset += n_ctx
+        
+        return results
+    
+    def _prepare_texts(
+        self,
+        hierarchical_doc,
+        include_contextualized: bool,
+    ) -> dict[str, list[str]]:
+        """Prepara los textos a embeber de un documento."""
         chunk_texts = []
         chunk_ids = []
         block_texts = []
@@ -145,60 +336,82 @@ class MultiGranularEmbedder:
         contextualized_texts = []
         contextualized_ids = []
         
+        # Prefijo de contexto por bloque (None si el chunk no tiene padre)
+        block_prefix: dict[str, Optional[str]] = {}
+        
         for chunk in hierarchical_doc.chunks:
             chunk_texts.append(chunk.content)
             chunk_ids.append(chunk.chunk_id)
             
             if include_contextualized:
-                # Obtener contexto del padre
-                parent = hierarchical_doc.get_parent(chunk.chunk_id)
-                if parent:
-                    context = self._build_context(chunk, parent)
-                    contextualized_texts.append(context)
+                # Obtener contexto del padre (una vez por bloque)
+                if chunk.block_id not in block_prefix:
+                    parent = hierarchical_doc.get_parent(chunk.chunk_id)
+                    block_prefix[chunk.block_id] = (
+                        self._context_prefix(parent) if parent else None
+                    )
+                prefix = block_prefix[chunk.block_id]
+                if prefix is not None:
+                    contextualized_texts.append(self._build_context(chunk, prefix))
                     contextualized_ids.append(chunk.chunk_id)
         
         for block in hierarchical_doc.blocks:
             block_texts.append(block.summary)
             block_ids.append(block.block_id)
         
-        # 2. Generar embeddings en batches
-        chunk_embeds = self._batch_embed(chunk_texts)
-        block_embeds = self._batch_embed(block_texts)
+        return {
+            "chunk_texts": chunk_texts,
+            "chunk_ids": chunk_ids,
+            "block_texts": block_texts,
+            "block_ids": block_ids,
+            "contextualized_texts": contextualized_texts,
+            "contextualized_ids": contextualized_ids,
+        }
+    
+    def _build_document_embeddings(
+        self,
+        hierarchical_doc,
+        prepared: dict[str, list[str]],
+        chunk_embeds: np.ndarray,
+        block_embeds: np.ndarray,
+        contextualized_embeds: np.ndarray,
+        include_contextualized: bool,
+    ) -> DocumentEmbeddings:
+        """Construye DocumentEmbeddings a partir de los vectores generados."""
+        chunk_ids = prepared["chunk_ids"]
+        block_ids = prepared["block_ids"]
+        contextualized_ids = prepared["contextualized_ids"]
         
-        contextualized_embeds = []
-        if include_contextualized and contextualized_texts:
-            contextualized_embeds = self._batch_embed(contextualized_texts)
+        # Posición de cada bloque / texto contextualizado (O(1) por chunk)
+        block_id_to_idx = _first_positions(block_ids)
+        ctx_id_to_idx = _first_positions(contextualized_ids)
         
-        # 3. Construir resultado
-        chunk_embeddings = {}
-        for i, chunk_id in enumerate(chunk_ids):
-            chunk_emb = ChunkEmbeddings(
-                chunk_id=chunk_id,
-                chunk_embedding=chunk_embeds[i] if i < len(chunk_embeds) else [],
+        # Un vector por texto: un desajuste es un error, no un hueco
+        if len(contextualized_embeds) != len(contextualized_ids):
+            raise ValueError(
+                f"{len(contextualized_ids)} textos contextualizados y "
+                f"{len(contextualized_embeds)} embeddings"
             )
+        
+        chunk_embeddings = {}
+        for chunk_id, chunk_vec in zip(chunk_ids, chunk_embeds, strict=True):
+            chunk_emb = ChunkEmbeddings(chunk_id=chunk_id, chunk_embedding=chunk_vec)
             
             # Añadir block embedding
             chunk = hierarchical_doc.chunk_index[chunk_id]
-            block_idx = next(
-                (j for j, bid in enumerate(block_ids) if bid == chunk.block_id),
-                None
-            )
+            block_idx = block_id_to_idx.get(chunk.block_id)
             if block_idx is not None:
                 chunk_emb.block_embedding = block_embeds[block_idx]
             
             # Añadir contextualized embedding
-            if include_contextualized and chunk_id in contextualized_ids:
-                ctx_idx = contextualized_ids.index(chunk_id)
-                if ctx_idx < len(contextualized_embeds):
+            if include_contextualized:
+                ctx_idx = ctx_id_to_idx.get(chunk_id)
+                if ctx_idx is not None:
                     chunk_emb.contextualized_embedding = contextualized_embeds[ctx_idx]
             
             chunk_embeddings[chunk_id] = chunk_emb
         
-        block_embeddings = {
-            block_id: block_embeds[i]
-            for i, block_id in enumerate(block_ids)
-            if i < len(block_embeds)
-        }
+        block_embeddings = dict(zip(block_ids, block_embeds, strict=True))
         
         return DocumentEmbeddings(
             source_id=hierarchical_doc.source_id,
@@ -206,12 +419,16 @@ class MultiGranularEmbedder:
             block_embeddings=block_embeddings,
             embedding_model=self.model,
             embedding_dim=self.embedding_dim,
+            chunk_matrix=np.ascontiguousarray(chunk_embeds),
+            chunk_id_to_row=_first_positions(chunk_ids),
+            block_matrix=np.ascontiguousarray(block_embeds),
+            block_id_to_row=_first_positions(block_ids),
         )
     
     def embed_chunks_only(
         self,
         hierarchical_doc,
-    ) -> dict[str, list[float]]:
+    ) -> dict[str, np.ndarray]:
         """
         Genera solo embeddings de chunks (más rápido).
         
@@ -221,18 +438,15 @@ class MultiGranularEmbedder:
         texts = [chunk.content for chunk in hierarchical_doc.chunks]
         ids = [chunk.chunk_id for chunk in hierarchical_doc.chunks]
         
-        embeddings = self._batch_embed(texts)
+        embeddings = self._for_storage(self._batch_embed(texts))
         
-        return {
-            chunk_id: embeddings[i]
-            for i, chunk_id in enumerate(ids)
-            if i < len(embeddings)
-        }
+        # _batch_embed devuelve exactamente un vector por texto
+        return dict(zip(ids, embeddings))
     
     def embed_blocks_only(
         self,
         hierarchical_doc,
-    ) -> dict[str, list[float]]:
+    ) -> dict[str, np.ndarray]:
         """
         Genera solo embeddings de bloques.
         
@@ -242,13 +456,10 @@ class MultiGranularEmbedder:
         texts = [block.summary for block in hierarchical_doc.blocks]
         ids = [block.block_id for block in hierarchical_doc.blocks]
         
-        embeddings = self._batch_embed(texts)
+        embeddings = self._for_storage(self._batch_embed(texts))
         
-        return {
-            block_id: embeddings[i]
-            for i, block_id in enumerate(ids)
-            if i < len(embeddings)
-        }
+        # _batch_embed devuelve exactamente un vector por texto
+        return dict(zip(ids, embeddings))
     
     def embed_query(self, query: str) -> list[float]:
         """
@@ -262,7 +473,7 @@ class MultiGranularEmbedder:
         """
         return self.embed_text(query)
     
-    def embed_queries(self, queries: list[str]) -> list[list[float]]:
+    def embed_queries(self, queries: list[str]) -> np.ndarray:
         """
         Genera embeddings para múltiples queries.
         
@@ -270,104 +481,348 @@ class MultiGranularEmbedder:
             queries: Lista de textos de búsqueda
             
         Returns:
-            Lista de vectores embedding
+            Matriz float32 [N, D] (una fila por query)
         """
         return self._batch_embed(queries)
     
-    def _build_context(self, chunk, block) -> str:
+    @staticmethod
+    def _context_prefix(block) -> str:
+        """Prefijo contextual de un bloque: su heading (si existe)."""
+        return f"[{block.heading}] " if block.heading else ""
+    
+    def _build_context(self, chunk, prefix: str) -> str:
         """
         Construye texto contextualizado para embedding.
         
         Combina:
-        - Heading del bloque (si existe)
+        - Prefijo del bloque (heading, precalculado por bloque)
         - Contenido del chunk
         - Hint de posición
         """
-        parts = []
-        
-        if block.heading:
-            parts.append(f"[{block.heading}]")
-        
-        parts.append(chunk.content)
-        
         # Añadir hint de posición si no es único
         if chunk.total_in_block > 1:
-            pos = chunk.position_in_block + 1
-            total = chunk.total_in_block
-            parts.append(f"[Parte {pos}/{total}]")
-        
-        return " ".join(parts)
+            return (
+                f"{prefix}{chunk.content} "
+                f"[Parte {chunk.position_in_block + 1}/{chunk.total_in_block}]"
+            )
+        return prefix + chunk.content
     
-    def _batch_embed(self, texts: list[str]) -> list[list[float]]:
+    def _batch_embed(self, texts: list[str]) -> np.ndarray:
         """
         Genera embeddings en batches para evitar límites de API.
+        
+        Los textos ya embebidos en este proceso (mismo modelo y mismo
+        contenido) salen de la cache; el resto se agrupa en batches
+        independientes que se envían en paralelo (hasta
+        `max_concurrency` requests a la vez) y se reúnen en orden.
+        
+        Returns:
+            Matriz float32 [N, D]
+        """
+        return self._embed_matrix(texts)
+    
+    def _iter_batch_embed(self, texts: list[str]) -> Iterator[np.ndarray]:
+        """
+        Versión en streaming de _batch_embed: un vector por texto, en orden.
+        
+        Cada vector se entrega en cuanto llega el batch que lo contiene,
+        mientras los batches siguientes siguen en vuelo; el consumidor
+        trabaja en paralelo con las llamadas a la API.
         """
         if not texts:
-            return []
+            return
         
-        all_embeddings = []
-        current_batch = []
-        current_tokens = 0
+        # 1. Resolver desde la cache por contenido
+        keys = [_EmbeddingCache.make_key(self.model, text) for text in texts]
+        cached = _embedding_cache.get_many(keys)
         
-        for text in texts:
-            estimated_tokens = len(text) // APPROX_CHARS_PER_TOKEN
-            
-            if current_tokens + estimated_tokens > MAX_TOKENS_PER_BATCH and current_batch:
-                # Procesar batch actual
-                batch_embeddings = self.embed_texts(current_batch)
-                all_embeddings.extend(batch_embeddings)
-                current_batch = []
-                current_tokens = 0
+        # 2. Textos pendientes, sin repetir
+        pending: dict[tuple[str, bytes], str] = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None and key not in pending:
+                pending[key] = text
+        
+        # 3. Embeber solo lo pendiente, consumiendo batches según se piden
+        new_by_key: dict[tuple[str, bytes], np.ndarray] = {}
+        pending_keys = iter(pending)
+        batch_results = self._iter_embed_batches(list(pending.values()))
+        
+        for key, vector in zip(keys, cached):
+            if vector is not None:
+                yield vector
+                continue
             
-            current_batch.append(text)
-            current_tokens += estimated_tokens
+            while key not in new_by_key:
+                batch_embeddings = next(batch_results)
+                batch_keys = [next(pending_keys) for _ in batch_embeddings]
+                _embedding_cache.put_many(list(zip(batch_keys, batch_embeddings)))
+                new_by_key.update(zip(batch_keys, batch_embeddings))
+            yield new_by_key[key]
+    
+    def _iter_embed_batches(self, texts: list[str]) -> Iterator[np.ndarray]:
+        """Llama a la API por batches, en paralelo, y los entrega en orden."""
+        if not texts:
+            return
+        
+        batches = self._plan_batches(texts)
+        
+        if len(batches) == 1 or self.max_concurrency <= 1:
+            yield from map(self._embed_batch_array, batches)
+            return
+        
+        workers = min(self.max_concurrency, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(self._embed_batch_array, batches)
+    
+    def _embed_batch_array(self, batch: list[str]) -> np.ndarray:
+        """
+        Embebe un batch y lo convierte a float32 [B, D] en la frontera.
+        
+        Las listas de floats de la API se descartan aquí (en el hilo del
+        batch): cache, matriz y coseno trabajan solo con ndarrays.
+        """
+        return np.asarray(self.embed_texts(batch), dtype=np.float32)
+    
+    def _embed_matrix(self, texts: list[str]) -> np.ndarray:
+        """
+        Embeddings de `texts` como matriz float32 [N, D].
+        
+        La matriz se llena fila a fila desde _iter_batch_embed: la
+        conversión a float32 de un batch se solapa con los que siguen
+        en vuelo.
+        """
+        vectors = self._iter_batch_embed(texts)
+        first = next(vectors, None)
+        if first is None:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
         
-        # Procesar último batch
-        if current_batch:
-            batch_embeddings = self.embed_texts(current_batch)
-            all_embeddings.extend(batch_embeddings)
+        matrix = np.empty((len(texts), len(first)), dtype=np.float32)
+        matrix[0] = first
+        for row, vector in enumerate(vectors, start=1):
+            matrix[row] = vector
+        return matrix
+    
+    def _plan_batches(self, texts: list[str]) -> list[list[str]]:
+        """
+        Agrupa textos en batches de hasta MAX_TOKENS_PER_BATCH (estimados).
+        
+        Los cortes salen de la suma acumulada de tokens estimados
+        (np.searchsorted), sin acumular texto a texto en Python. Un texto
+        que por sí solo supera el límite va en su propio batch.
+        """
+        n_texts = len(texts)
+        tokens = np.fromiter(map(len, texts), dtype=np.int64, count=n_texts)
+        cumulative = np.cumsum(tokens // APPROX_CHARS_PER_TOKEN)
+        
+        batches = []
+        start = 0
+        while start < n_texts:
+            consumed = int(cumulative[start - 1]) if start else 0
+            end = int(np.searchsorted(
+                cumulative, consumed + MAX_TOKENS_PER_BATCH, side="right"
+            ))
+            end = max(end, start + 1)
+            batches.append(texts[start:end])
+            start = end
         
-        return all_embeddings
+        return batches
+    
+    def _for_storage(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Convierte embeddings que van al índice en una matriz [N, D].
+        
+        float32 sin normalizar por defecto; normalizada y en
+        `embedding_dtype` si se indicó.
+        """
+        if not len(embeddings):
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        if self.embedding_dtype is None:
+            return np.asarray(embeddings, dtype=np.float32)
+        return _to_storage_matrix(embeddings, self.embedding_dtype)
 
 
 # =============================================================================
 # FUNCIONES DE UTILIDAD
 # =============================================================================
 
+def _first_positions(ids: list[str]) -> dict[str, int]:
+    """Posición de la primera aparición de cada ID (como list.index)."""
+    positions: dict[str, int] = {}
+    for i, item_id in enumerate(ids):
+        positions.setdefault(item_id, i)
+    return positions
+
+
+def _to_storage_matrix(
+    embeddings: list[list[float]] | np.ndarray,
+    dtype: str,
+) -> np.ndarray:
+    """
+    Convierte embeddings a una matriz normalizada del tipo indicado.
+    
+    La normalización se hace en float32 antes de reducir precisión,
+    así el error de redondeo queda acotado por vector unitario. Para
+    int8 se devuelven los códigos de quantize_int8_rows (misma dirección,
+    escala por fila descartada).
+    """
+    matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    if dtype == "int8":
+        codes, _ = quantize_int8_rows(matrix)
+        return codes
+    return matrix.astype(dtype)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza cada fila a norma 1 (las filas nulas quedan en 0)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms = np.where(norms == 0, 1, norms)  # Evitar división por 0
+    return matrix / norms
+
+
+def dequantize_int8(
+    codes: np.ndarray,
+    scale: np.ndarray,
+    zero_point: np.ndarray,
+) -> np.ndarray:
+    """Reconstruye embeddings int8 por columna (x ≈ codes * scale + zero_point)."""
+    return codes.astype(np.float32) * scale + zero_point
+
+
+def quantize_int8_rows(
+    embeddings: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cuantiza una matriz de embeddings a int8 con una escala por fila.
+    
+    Simétrica: cada fila se divide por max|v| / 127, de modo que
+    x ≈ codes * scale[:, None].
+    
+    Returns:
+        (codes int8 [N, D], scale float32 [N])
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    scale = np.abs(matrix).max(axis=1) / 127.0
+    scale = np.where(scale == 0, 1, scale).astype(np.float32)  # Filas nulas
+    
+    codes = np.rint(matrix / scale[:, None])
+    codes = np.clip(codes, -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def dequantize_int8_rows(codes: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """Reconstruye embeddings float32 desde quantize_int8_rows."""
+    return codes.astype(np.float32) * scale[:, None]
+
+
+def int8_cosine_similarity(codes_a: np.ndarray, codes_b: np.ndarray) -> float:
+    """
+    Similitud coseno entre dos vectores int8 (acumulando en int32).
+    
+    La escala por fila se cancela en el coseno, así que no se necesita.
+    """
+    a = codes_a.astype(np.int32)
+    b = codes_b.astype(np.int32)
+    
+    denom = math.sqrt(int(a @ a) * int(b @ b))
+    if denom == 0:
+        return 0.0
+    
+    return int(a @ b) / denom
+
+
 def cosine_similarity(vec1: list[float], vec2: list[float]) -> float:
-    """Calcula similitud coseno entre dos vectores."""
-    a = np.array(vec1)
-    b = np.array(vec2)
+    """
+    Calcula similitud coseno entre dos vectores.
     
-    norm_a = np.linalg.norm(a)
-    norm_b = np.linalg.norm(b)
+    Trabaja en float32 (sin copia si ya lo son) con tres productos
+    punto BLAS: sin vectores intermedios ni np.linalg.norm.
+    """
+    a = np.asarray(vec1, dtype=np.float32)
+    b = np.asarray(vec2, dtype=np.float32)
     
-    if norm_a == 0 or norm_b == 0:
+    denom = math.sqrt(float(np.dot(a, a)) * float(np.dot(b, b)))
+    if denom == 0:
         return 0.0
     
-    return float(np.dot(a, b) / (norm_a * norm_b))
+    return float(np.dot(a, b)) / denom
+
+
+class NormalizedCorpus:
+    """
+    Matriz de documentos para ranking por coseno.
+    
+    Las filas se normalizan una sola vez al insertarlas y se guardan en
+    una matriz float32 C-contigua, así cada query solo normaliza su
+    propio vector y hace un producto matriz-vector (BLAS sgemv).
+    """
+    
+    def __init__(self, embeddings: Optional[list[list[float]] | np.ndarray] = None):
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        if embeddings is not None and len(embeddings):
+            self.add(embeddings)
+    
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+    
+    def add(self, embeddings: list[list[float]] | np.ndarray) -> None:
+        """Normaliza y añade filas al corpus."""
+        rows = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        if len(self):
+            rows = np.vstack([self.matrix, rows])
+        self.matrix = np.ascontiguousarray(rows, dtype=np.float32)
 
 
 def batch_cosine_similarity(
     query_vec: list[float],
-    doc_vecs: list[list[float]],
-) -> list[float]:
-    """Calcula similitud coseno de una query contra múltiples documentos."""
-    query = np.array(query_vec)
-    docs = np.array(doc_vecs)
+    doc_vecs: list[list[float]] | np.ndarray | NormalizedCorpus,
+) -> np.ndarray:
+    """
+    Calcula similitud coseno de una query contra múltiples documentos.
+    
+    Acepta directamente DocumentEmbeddings.chunk_matrix (sin copia si
+    es float32). Para rankings repetidos sobre los mismos documentos,
+    pasar un NormalizedCorpus evita re-normalizar la matriz en cada
+    llamada.
     
+    Returns:
+        Array float32 [N] (sin convertir a lista: listo para argsort)
+    """
+    query = np.asarray(query_vec, dtype=np.float32)
     query_norm = np.linalg.norm(query)
-    if query_norm == 0:
-        return [0.0] * len(doc_vecs)
     
-    query_normalized = query / query_norm
+    if isinstance(doc_vecs, NormalizedCorpus):
+        if query_norm == 0 or not len(doc_vecs):
+            return np.zeros(len(doc_vecs), dtype=np.float32)
+        return doc_vecs.matrix @ (query / query_norm)
     
-    doc_norms = np.linalg.norm(docs, axis=1, keepdims=True)
-    doc_norms = np.where(doc_norms == 0, 1, doc_norms)  # Evitar división por 0
-    docs_normalized = docs / doc_norms
+    # Matriz sin normalizar: dividir el producto por las normas, sin
+    # materializar una copia normalizada de los documentos
+    docs = np.asarray(doc_vecs, dtype=np.float32)
+    if query_norm == 0 or not len(docs):
+        return np.zeros(len(docs), dtype=np.float32)
     
-    similarities = np.dot(docs_normalized, query_normalized)
-    return similarities.tolist()
+    doc_norms = np.linalg.norm(docs, axis=1)
+    doc_norms[doc_norms == 0] = 1  # Evitar división por 0
+    return (docs @ query) / (doc_norms * query_norm)
+
+
+def batch_cosine_similarity_many(
+    query_vecs: list[list[float]] | np.ndarray,
+    corpus: NormalizedCorpus,
+) -> np.ndarray:
+    """
+    Similitud coseno de M queries contra todo el corpus.
+    
+    Un único producto de matrices (BLAS sgemm, multihilo y sin GIL)
+    en lugar de M llamadas a batch_cosine_similarity.
+    
+    Returns:
+        Array float32 [M, N]
+    """
+    queries = _normalize_rows(np.asarray(query_vecs, dtype=np.float32))
+    if not len(corpus):
+        return np.zeros((len(queries), 0), dtype=np.float32)
+    return queries @ corpus.matrix.T
 
 
 # =============================================================================
@@ -25,7 +25,10 @@ from __future__ import annotations
 import json
 import os
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
+from itertools import islice
 from typing import Any, List
 
 from dotenv import load_dotenv
@@ -42,6 +45,12 @@ from core.state_schema import (
     generate_plan_id,
 )
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 load_dotenv()
 
 
@@ -124,6 +133,17 @@ REGLAS CRÍTICAS:
 Responde con el plan ordenado y cualquier solapamiento o vacío que detectes.
 """
 
+# Plantillas compiladas una sola vez (no dependen del estado)
+_TOPIC_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Eres un experto en análisis de contenido educativo."),
+    ("human", TOPIC_DETECTION_PROMPT)
+])
+
+_ORDER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Eres un arquitecto de planes de estudio."),
+    ("human", ORDERING_PROMPT)
+])
+
 
 # =============================================================================
 # FUNCIONES AUXILIARES
@@ -150,10 +170,57 @@ def get_llm() -> BaseChatModel | None:
         return None
 
 
+def _topics_json(topics: list[TopicDetection]) -> str:
+    """JSON indentado de los temas (orjson si está instalado, mismo texto)."""
+    dumped = [t.model_dump() for t in topics]
+    if HAS_ORJSON:
+        return orjson.dumps(dumped, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(dumped, indent=2, ensure_ascii=False)
+
+
+# Cadenas prompt | structured_llm ya construidas, por (LLM, schema)
+STRUCTURED_CHAIN_CACHE_SIZE = 8
+_structured_chains: OrderedDict[tuple[int, type], tuple[BaseChatModel, Any]] = OrderedDict()
+_structured_chains_lock = threading.Lock()
+
+
+def _structured_chain(
+    llm: BaseChatModel,
+    prompt: ChatPromptTemplate,
+    schema: type[BaseModel],
+) -> Any:
+    """
+    Devuelve `prompt | llm.with_structured_output(schema)`, memoizado.
+    
+    with_structured_output genera el JSON schema de Pydantic en cada
+    llamada; la cadena se reutiliza mientras se use la misma instancia
+    de LLM (se compara identidad, no solo id()).
+    """
+    key = (id(llm), schema)
+    with _structured_chains_lock:
+        cached = _structured_chains.get(key)
+        if cached is not None and cached[0] is llm:
+            _structured_chains.move_to_end(key)
+            return cached[1]
+    
+    chain = prompt | llm.with_structured_output(schema)
+    
+    with _structured_chains_lock:
+        _structured_chains[key] = (llm, chain)
+        _structured_chains.move_to_end(key)
+        if len(_structured_chains) > STRUCTURED_CHAIN_CACHE_SIZE:
+            _structured_chains.popitem(last=False)
+    return chain
+
+
 # =============================================================================
 # DETECCIÓN DE TEMAS
 # =============================================================================
 
+# Headers markdown (#, ##, ###) que usa el fallback heurístico
+_HEADER_RE = re.compile(r'^#{1,3}\s+(.+)$', re.MULTILINE)
+MAX_HEURISTIC_TOPICS = 10
+
 def detect_topics(content: str, llm: BaseChatModel | None = None) -> list[TopicDetection]:
     """
     Detecta temas en el contenido usando LLM.
@@ -169,14 +236,7 @@ def detect_topics(content: str, llm: BaseChatModel | None = None) -> list[TopicD
         return _detect_topics_heuristic(content)
     
     try:
-        structured_llm = llm.with_structured_output(TopicListDetection)
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "Eres un experto en análisis de contenido educativo."),
-            ("human", TOPIC_DETECTION_PROMPT)
-        ])
-        
-        chain = prompt | structured_llm
+        chain = _structured_chain(llm, _TOPIC_PROMPT, TopicListDetection)
         result = chain.invoke({"content": content[:15000]})
         
         return result.topics
@@ -190,11 +250,14 @@ def _detect_topics_heuristic(content: str) -> list[TopicDetection]:
     """Fallback heurístico para detección de temas."""
     topics = []
     
-    # Buscar headers
-    headers = re.findall(r'^#{1,3}\s+(.+)$', content, re.MULTILINE)
+    # Buscar headers (el escaneo se detiene al llegar al máximo de temas)
+    headers = [
+        match.group(1)
+        for match in islice(_HEADER_RE.finditer(content), MAX_HEURISTIC_TOPICS)
+    ]
     
     if headers:
-        for i, header in enumerate(headers[:10]):  # Máximo 10 temas
+        for header in headers:
             topics.append(TopicDetection(
                 name=header.strip(),
                 description=f"Sección sobre {header}",
@@ -238,20 +301,9 @@ def create_ordered_plan(
     
     try:
         # Preparar JSON de topics para el prompt
-        topics_json = json.dumps(
-            [t.model_dump() for t in topics],
-            indent=2,
-            ensure_ascii=False
-        )
-        
-        structured_llm = llm.with_structured_output(OrderedPlan)
+        topics_json = _topics_json(topics)
         
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "Eres un arquitecto de planes de estudio."),
-            ("human", ORDERING_PROMPT)
-        ])
-        
-        chain = prompt | structured_llm
+        chain = _structured_chain(llm, _ORDER_PROMPT, OrderedPlan)
         result = chain.invoke({"topics_json": topics_json})
         
         return result
@@ -357,10 +409,13 @@ def detect_risks(ordered_plan: OrderedPlan) -> list[DetectedRisk]:
         topic_id = f"topic_{topic.position:03d}"
         dep_graph[topic_id] = topic.depends_on
     
+    # Dependencias como sets: cada comprobación es O(1)
+    dep_sets = {topic_id: set(deps) for topic_id, deps in dep_graph.items()}
+    
     # Simple check for circular deps
     for topic_id, deps in dep_graph.items():
         for dep in deps:
-            if topic_id in dep_graph.get(dep, []):
+            if topic_id in dep_sets.get(dep, ()):
                 risks.append(DetectedRisk(
                     risk_type="dependency",
                     severity=RiskLevel.HIGH,
@@ -12,15 +12,23 @@ El Writer recibe un "Evidence Pack" coherente, no fragmentos sueltos.
 
 from __future__ import annotations
 
+import logging
+from collections import defaultdict
 from dataclasses import dataclass, field
+from functools import cached_property
+from itertools import groupby, pairwise
+from operator import attrgetter, itemgetter
+from sys import intern
 from typing import Optional, Any
 
+logger = logging.getLogger(__name__)
+
 
 # =============================================================================
 # ESTRUCTURAS DE DATOS
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class ContextualChunk:
     """Chunk con su contexto estructural adjunto."""
     chunk_id: str
@@ -37,6 +45,8 @@ class ContextualChunk:
     
     # Posición
     position_in_narrative: int = 0
+    position_in_doc: int = 999            # Del bloque en el documento
+    position_in_block: int = 0            # Del chunk dentro del bloque
     block_id: Optional[str] = None
     is_block_start: bool = False
     is_block_end: bool = False
@@ -64,18 +74,26 @@ class EvidencePack:
     total_tokens_estimate: int = 0
     has_full_coverage: bool = True
     
-    # Texto formateado listo para prompt
-    formatted_context: str = ""
+    # Texto fijo para el prompt (p. ej. pack vacío); None = formatear chunks
+    fixed_context: Optional[str] = None
     
     def __post_init__(self):
         self.total_chunks = len(self.chunks)
-        # Estimación aproximada de tokens
-        total_chars = sum(
-            len(c.content) + 
-            (len(c.parent_summary or "") if c.include_parent else 0)
+        # Estimación aproximada de tokens: contenidos + resúmenes incluidos
+        total_chars = sum(map(len, map(attrgetter("content"), self.chunks)))
+        total_chars += sum(
+            len(c.parent_summary)
             for c in self.chunks
+            if c.include_parent and c.parent_summary
         )
         self.total_tokens_estimate = total_chars // 4
+    
+    @cached_property
+    def formatted_context(self) -> str:
+        """Texto formateado listo para prompt (se genera al primer acceso)."""
+        if self.fixed_context is not None:
+            return self.fixed_context
+        return _format_chunks(self.chunks)
 
 
 # =============================================================================
@@ -87,12 +105,55 @@ INCLUDE_PARENT_IF_FIRST = True      # Si es primer chunk del bloque
 INCLUDE_PARENT_IF_COMPLEX = True    # Si el bloque tiene 3+ chunks
 MIN_PARENT_SUMMARY_LENGTH = 50      # Mínimo chars para incluir
 
-# Formato de transiciones
+# Formato de transiciones (referencia: _add_transitions y _format_chunks
+# los escriben como f-strings para no parsear la plantilla por chunk)
 TRANSITION_TEMPLATE = "[{heading}]\n"
 CHUNK_SEPARATOR = "\n\n---\n\n"
 PARENT_MARKER = "[Contexto: {heading}]\n{summary}\n\n"
 
 
+# =============================================================================
+# FORMATO
+# =============================================================================
+
+def _format_chunks(chunks: list[ContextualChunk]) -> str:
+    """
+    Formatea chunks en texto listo para prompt.
+    
+    Todas las piezas (separadores incluidos) van a una sola lista
+    que se une una vez al final, sin strings intermedios por chunk.
+    """
+    out = []
+    append = out.append
+    sep = CHUNK_SEPARATOR
+    
+    for i, chunk in enumerate(chunks):
+        if i:
+            append(sep)
+        
+        # Transición de entrada
+        if chunk.transition_in:
+            append(chunk.transition_in)
+            append("\n")
+        
+        # Contexto del padre
+        if chunk.include_parent and chunk.parent_summary:
+            append(
+                f"[Contexto: {chunk.parent_heading or 'Sección'}]\n"
+                f"{chunk.parent_summary[:200]}...\n\n"
+            )
+            append("\n")
+        
+        # Contenido del chunk
+        append(chunk.content)
+        
+        # Indicador de faceta (útil para debug)
+        if chunk.facet_name:
+            append(f"\n\n[Relevante para: {chunk.facet_name}]")
+    
+    return "".join(out)
+
+
 # =============================================================================
 # CONTEXT ASSEMBLER
 # =============================================================================
@@ -138,39 +199,25 @@ class ContextAssembler:
         if not selected_chunks:
             return self._empty_pack(query_plan)
         
-        # 1. Convertir a ContextualChunk y enriquecer
-        contextual_chunks = []
-        for i, chunk in enumerate(selected_chunks):
-            ctx_chunk = self._enrich_chunk(chunk, i)
-            contextual_chunks.append(ctx_chunk)
+        # 1. Convertir a ContextualChunk y enriquecer (agrupando por bloque)
+        contextual_chunks, by_block = self._enrich_chunks(selected_chunks)
         
         # 2. Adjuntar contexto de padres
-        contextual_chunks = self._attach_parent_contexts(contextual_chunks)
+        contextual_chunks = self._attach_parent_contexts(contextual_chunks, by_block)
         
-        # 3. Añadir transiciones entre bloques
-        contextual_chunks = self._add_transitions(contextual_chunks)
-        
-        # 4. Ordenar por narrativa
+        # 3. Ordenar por narrativa
         contextual_chunks = self._order_by_narrative(contextual_chunks)
         
-        # 5. Formatear contexto
-        formatted = self._format_context(contextual_chunks)
-        
-        # 6. Construir pack
-        facets_covered = [
-            fc.facet_name 
-            for fc in coverage_result.facet_coverage.values()
-            if fc.is_covered
-        ]
-        facets_missing = coverage_result.missing_required + coverage_result.missing_optional
+        # 4. Añadir transiciones entre bloques (sobre el orden final)
+        contextual_chunks = self._add_transitions(contextual_chunks)
         
+        # 5. Construir pack (el contexto se formatea al leerlo)
         return EvidencePack(
             topic_name=query_plan.topic_name,
             chunks=contextual_chunks,
-            facets_covered=facets_covered,
-            facets_missing=facets_missing,
+            facets_covered=coverage_result.facets_covered,
+            facets_missing=coverage_result.facets_missing,
             has_full_coverage=coverage_result.is_complete,
-            formatted_context=formatted,
         )
     
     def assemble_simple(
@@ -188,14 +235,10 @@ class ContextAssembler:
         Returns:
             EvidencePack básico
         """
-        contextual_chunks = []
-        for i, chunk in enumerate(chunks):
-            ctx_chunk = self._enrich_chunk(chunk, i)
-            contextual_chunks.append(ctx_chunk)
+        contextual_chunks, by_block = self._enrich_chunks(chunks)
         
-        contextual_chunks = self._attach_parent_contexts(contextual_chunks)
+        contextual_chunks = self._attach_parent_contexts(contextual_chunks, by_block)
         contextual_chunks = self._order_by_narrative(contextual_chunks)
-        formatted = self._format_context(contextual_chunks)
         
         return EvidencePack(
             topic_name=topic_name,
@@ -203,35 +246,70 @@ class ContextAssembler:
             facets_covered=[],
             facets_missing=[],
             has_full_coverage=True,
-            formatted_context=formatted,
         )
     
+    def _enrich_chunks(
+        self,
+        chunks: list,
+    ) -> tuple[list[ContextualChunk], dict[str, list[ContextualChunk]]]:
+        """
+        Enriquece todos los chunks y los agrupa por bloque en la misma pasada.
+        
+        Returns:
+            (chunks enriquecidos, block_id → chunks de ese bloque)
+        """
+        contextual_chunks = []
+        by_block: defaultdict[str, list[ContextualChunk]] = defaultdict(list)
+        
+        for i, chunk in enumerate(chunks):
+            ctx_chunk = self._enrich_chunk(chunk, i)
+            contextual_chunks.append(ctx_chunk)
+            if ctx_chunk.block_id:
+                by_block[ctx_chunk.block_id].append(ctx_chunk)
+        
+        return contextual_chunks, by_block
+    
     def _enrich_chunk(
         self,
         chunk,
         position: int,
     ) -> ContextualChunk:
-        """Convierte chunk a ContextualChunk con metadata."""
+        """
+        Convierte chunk a ContextualChunk con metadata.
+        
+        block_id y facet_name se internan: se repiten entre chunks y se
+        usan como claves de by_block y en las comparaciones de
+        _add_transitions. Solo se internan si son str.
+        """
         metadata = getattr(chunk, 'metadata', {})
+        get = metadata.get
+        position_in_block = get("position_in_block", 0)
+        
+        block_id = get("block_id")
+        if type(block_id) is str:
+            block_id = intern(block_id)
+        facet_name = getattr(chunk, 'primary_facet_name', None)
+        if type(facet_name) is str:
+            facet_name = intern(facet_name)
         
         return ContextualChunk(
             chunk_id=chunk.chunk_id,
             content=chunk.content,
             position_in_narrative=position,
-            block_id=metadata.get("block_id"),
-            is_block_start=metadata.get("position_in_block", 0) == 0,
-            is_block_end=(
-                metadata.get("position_in_block", 0) == 
-                metadata.get("total_in_block", 1) - 1
-            ),
+            position_in_doc=get("position_in_doc", 999),
+            position_in_block=position_in_block,
+            block_id=block_id,
+            is_block_start=position_in_block == 0,
+            is_block_end=position_in_block == get("total_in_block", 1) - 1,
             metadata=metadata,
             relevance_score=getattr(chunk, 'relevance_score', 0.0),
-            facet_name=getattr(chunk, 'primary_facet_name', None),
+            facet_name=facet_name,
         )
     
     def _attach_parent_contexts(
         self,
         chunks: list[ContextualChunk],
+        by_block: dict[str, list[ContextualChunk]],
     ) -> list[ContextualChunk]:
         """
         Decide si adjuntar contexto del padre a cada chunk.
@@ -240,75 +318,89 @@ class ContextAssembler:
         - Primer chunk de un bloque → incluir heading
         - Bloque con muchos chunks → incluir summary
         - Único chunk del bloque → no incluir (ya tiene contexto)
+        
+        `by_block` agrupa `chunks` por block_id (ver _enrich_chunks).
         """
         if not self.index:
             return chunks
         
-        # Agrupar por bloque para contar
-        by_block: dict[str, list[ContextualChunk]] = {}
-        for chunk in chunks:
-            if chunk.block_id:
-                if chunk.block_id not in by_block:
-                    by_block[chunk.block_id] = []
-                by_block[chunk.block_id].append(chunk)
+        # Todos los padres en una sola consulta
+        parents = self._fetch_parents(list(by_block))
+        
+        # Locales para el bucle
+        min_len = MIN_PARENT_SUMMARY_LENGTH
+        include_first = self.include_parent_for_first
+        include_complex = self.include_parent_for_complex
         
-        for chunk in chunks:
-            if not chunk.block_id:
+        for block_id, block_chunks in by_block.items():
+            parent = parents.get(block_id)
+            if parent is None:
                 continue
             
-            try:
-                parent = self.index.get_block_by_id(chunk.block_id)
-                if not parent:
-                    continue
-                
-                parent_heading = parent.metadata.get("heading", "")
-                
-                # Decidir si incluir
-                should_include = False
-                
-                # Primer chunk del bloque
-                if self.include_parent_for_first and chunk.is_block_start:
-                    should_include = True
-                
-                # Bloque complejo (3+ chunks seleccionados)
-                block_chunks_count = len(by_block.get(chunk.block_id, []))
-                if self.include_parent_for_complex and block_chunks_count >= 3:
-                    should_include = True
-                
-                if should_include and parent_heading:
+            parent_heading = (getattr(parent, "metadata", None) or {}).get("heading", "")
+            if not parent_heading:
+                continue
+            
+            # Summary = primeros N chars del contenido
+            parent_content = parent.content[:300] if parent.content else ""
+            has_summary = len(parent_content) >= min_len
+            
+            # Bloque complejo (3+ chunks seleccionados)
+            is_complex = include_complex and len(block_chunks) >= 3
+            
+            for chunk in block_chunks:
+                # Primer chunk del bloque o bloque complejo
+                if is_complex or (include_first and chunk.is_block_start):
                     chunk.parent_heading = parent_heading
-                    # Summary = primeros N chars del contenido
-                    parent_content = parent.content[:300] if parent.content else ""
-                    if len(parent_content) >= MIN_PARENT_SUMMARY_LENGTH:
+                    if has_summary:
                         chunk.parent_summary = parent_content
                     chunk.include_parent = True
-                    
-            except Exception:
-                pass
         
         return chunks
     
+    def _fetch_parents(self, block_ids: list[str]) -> dict[str, Any]:
+        """
+        Obtiene los bloques padre (block_id → bloque).
+        
+        Usa get_blocks_by_ids (una consulta) si el índice lo tiene; si no,
+        get_block_by_id por bloque. Los bloques ausentes se omiten (un
+        índice que los señale con KeyError queda registrado en el log);
+        cualquier otro error del índice se propaga.
+        """
+        get_blocks_by_ids = getattr(self.index, "get_blocks_by_ids", None)
+        if get_blocks_by_ids is not None:
+            return get_blocks_by_ids(block_ids)
+        
+        parents = {}
+        for block_id in block_ids:
+            try:
+                parent = self.index.get_block_by_id(block_id)
+            except KeyError:
+                logger.warning("Bloque padre no encontrado en el índice: %s", block_id)
+                continue
+            if parent:
+                parents[block_id] = parent
+        return parents
+    
     def _add_transitions(
         self,
         chunks: list[ContextualChunk],
     ) -> list[ContextualChunk]:
         """
         Añade transiciones entre chunks de diferentes bloques.
+        
+        Espera los chunks ya en orden narrativo: marca el primer chunk
+        de cada tramo consecutivo del mismo bloque.
         """
         if len(chunks) <= 1:
             return chunks
         
-        prev_block = None
-        for chunk in chunks:
-            current_block = chunk.block_id
+        for _, block_chunks in groupby(chunks, key=attrgetter("block_id")):
+            first = next(block_chunks)
             
             # Si cambia de bloque y tiene heading, añadir transición
-            if current_block != prev_block and chunk.parent_heading:
-                chunk.transition_in = TRANSITION_TEMPLATE.format(
-                    heading=chunk.parent_heading
-                )
-            
-            prev_block = current_block
+            if first.parent_heading:
+                first.transition_in = f"[{first.parent_heading}]\n"
         
         return chunks
     
@@ -322,47 +414,18 @@ class ContextAssembler:
         Prioridad:
         1. Posición del bloque en el documento
         2. Posición del chunk dentro del bloque
-        """
-        def sort_key(chunk: ContextualChunk):
-            block_pos = chunk.metadata.get("position_in_doc", 999)
-            chunk_pos = chunk.metadata.get("position_in_block", 0)
-            return (block_pos, chunk_pos)
         
-        return sorted(chunks, key=sort_key)
-    
-    def _format_context(
-        self,
-        chunks: list[ContextualChunk],
-    ) -> str:
+        Si ya vienen en orden (lo habitual) se devuelven sin copiar.
         """
-        Formatea chunks en texto listo para prompt.
-        """
-        parts = []
+        if len(chunks) < 2:
+            return chunks
         
-        for i, chunk in enumerate(chunks):
-            chunk_text = []
-            
-            # Transición de entrada
-            if chunk.transition_in:
-                chunk_text.append(chunk.transition_in)
-            
-            # Contexto del padre
-            if chunk.include_parent and chunk.parent_summary:
-                chunk_text.append(PARENT_MARKER.format(
-                    heading=chunk.parent_heading or "Sección",
-                    summary=chunk.parent_summary[:200] + "..."
-                ))
-            
-            # Contenido del chunk
-            chunk_text.append(chunk.content)
-            
-            # Indicador de faceta (útil para debug)
-            if chunk.facet_name:
-                chunk_text.append(f"\n[Relevante para: {chunk.facet_name}]")
-            
-            parts.append("\n".join(chunk_text))
+        keys = [(c.position_in_doc, c.position_in_block) for c in chunks]
+        if all(a <= b for a, b in pairwise(keys)):
+            return chunks
         
-        return CHUNK_SEPARATOR.join(parts)
+        # Orden estable por clave precalculada
+        return [c for _, c in sorted(zip(keys, chunks), key=itemgetter(0))]
     
     def _empty_pack(self, query_plan) -> EvidencePack:
         """Retorna pack vacío."""
@@ -372,7 +435,7 @@ class ContextAssembler:
             facets_covered=[],
             facets_missing=[f.name for f in query_plan.facets],
             has_full_coverage=False,
-            formatted_context="[No se encontró evidencia relevante]",
+            fixed_context="[No se encontró evidencia relevante]",
         )
 
 
@@ -414,25 +477,26 @@ def format_for_prompt(
     Returns:
         Texto formateado
     """
-    parts = []
-    
-    # Header
-    parts.append(f"=== CONTEXTO PARA: {evidence_pack.topic_name} ===")
-    parts.append(f"({evidence_pack.total_chunks} fragmentos, ~{evidence_pack.total_tokens_estimate} tokens)")
-    parts.append("")
-    
     # Cobertura
+    coverage = ""
     if include_coverage_info:
-        if evidence_pack.facets_covered:
-            parts.append(f"[OK] Cubre: {', '.join(evidence_pack.facets_covered)}")
-        if evidence_pack.facets_missing:
-            parts.append(f"[WARN] Falta: {', '.join(evidence_pack.facets_missing)}")
-        parts.append("")
-    
-    # Contenido
-    parts.append(evidence_pack.formatted_context)
-    
-    parts.append("")
-    parts.append("=== FIN CONTEXTO ===")
+        covered = (
+            f"[OK] Cubre: {', '.join(evidence_pack.facets_covered)}\n"
+            if evidence_pack.facets_covered else ""
+        )
+        missing = (
+            f"[WARN] Falta: {', '.join(evidence_pack.facets_missing)}\n"
+            if evidence_pack.facets_missing else ""
+        )
+        coverage = f"{covered}{missing}\n"
     
-    return "\n".join(parts)
\ No newline at end of file
+    # Header + cobertura + contenido en un solo string
+    return (
+        f"=== CONTEXTO PARA: {evidence_pack.topic_name} ===\n"
+        f"({evidence_pack.total_chunks} fragmentos, ~{evidence_pack.total_tokens_estimate} tokens)\n"
+        f"\n"
+        f"{coverage}"
+        f"{evidence_pack.formatted_context}\n"
+        f"\n"
+        f"=== FIN CONTEXTO ==="
+    )
\ No newline at end of file
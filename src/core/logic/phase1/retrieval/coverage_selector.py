@@ -13,9 +13,15 @@ Esto es Retrieval como "composición de evidencia", no como ranking.
 
 from __future__ import annotations
 
+from bisect import bisect_right
+from collections import Counter
+import heapq
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Any
 from enum import Enum
+from itertools import islice
+from operator import itemgetter
+import numpy as np
 
 
 # =============================================================================
@@ -30,7 +36,7 @@ class CoverageStatus(Enum):
     MISSING = "missing"     # Score < 0.2
 
 
-@dataclass
+@dataclass(slots=True)
 class FacetCoverage:
     """Cobertura de una faceta específica."""
     facet_id: str
@@ -46,7 +52,7 @@ class FacetCoverage:
         return self.status in (CoverageStatus.STRONG, CoverageStatus.PARTIAL)
 
 
-@dataclass
+@dataclass(slots=True)
 class CoverageResult:
     """Resultado de la selección por cobertura."""
     selected_chunks: list  # list[ScoredCandidate]
@@ -63,10 +69,36 @@ class CoverageResult:
     missing_required: list[str] = field(default_factory=list)
     missing_optional: list[str] = field(default_factory=list)
     
+    # Memo de las listas derivadas (slots no admite cached_property)
+    _facets_covered: list[str] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _facets_missing: list[str] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    
     @property
     def is_complete(self) -> bool:
         """True si todas las facetas required están cubiertas."""
         return len(self.missing_required) == 0
+    
+    @property
+    def facets_covered(self) -> list[str]:
+        """Nombres de las facetas cubiertas (calculado una vez)."""
+        if self._facets_covered is None:
+            self._facets_covered = [
+                fc.facet_name
+                for fc in self.facet_coverage.values()
+                if fc.is_covered
+            ]
+        return self._facets_covered
+    
+    @property
+    def facets_missing(self) -> list[str]:
+        """Facetas sin cobertura, required primero (calculado una vez)."""
+        if self._facets_missing is None:
+            self._facets_missing = self.missing_required + self.missing_optional
+        return self._facets_missing
 
 
 # =============================================================================
@@ -86,6 +118,17 @@ DEFAULT_TARGET_CHUNKS = 8
 # Parámetros de diversidad
 DIVERSITY_THRESHOLD = 0.6  # Similitud máxima entre chunks seleccionados
 
+# Umbrales ordenados → estado (bisect sobre _THRESHOLDS indexa _STATUSES)
+_THRESHOLDS = (WEAK_THRESHOLD, PARTIAL_THRESHOLD, STRONG_THRESHOLD)
+_STATUSES = (
+    CoverageStatus.MISSING,
+    CoverageStatus.WEAK,
+    CoverageStatus.PARTIAL,
+    CoverageStatus.STRONG,
+)
+_STATUS_RANK = {status: rank for rank, status in enumerate(_STATUSES)}
+_PARTIAL_RANK = _STATUS_RANK[CoverageStatus.PARTIAL]
+
 
 # =============================================================================
 # COVERAGE SELECTOR
@@ -113,6 +156,9 @@ class CoverageSelector:
         self.max_chunks = max_chunks
         self.target_chunks = target_chunks
         self.diversity_threshold = diversity_threshold
+        
+        # Conjuntos de palabras por texto (se vacía al terminar select)
+        self._tok_cache: dict[str, frozenset[str]] = {}
     
     def select(
         self,
@@ -133,39 +179,61 @@ class CoverageSelector:
         if not candidates:
             return self._empty_result(query_plan)
         
-        selected: list = []
-        selected_ids: set[str] = set()
+        try:
+            return self._select(candidates, query_plan)
+        finally:
+            self._tok_cache.clear()
+    
+    def _select(
+        self,
+        candidates: list,
+        query_plan,
+    ) -> CoverageResult:
+        """
+        Fases de selección sobre candidatos no vacíos (ver select).
+        
+        Las fases 1-4 añaden a `selected` in-place; los chunk_id de los
+        candidatos son únicos (el retriever los deduplica).
+        """
+        # chunk_id → chunk, en orden de selección (pertenencia y orden a la vez)
+        selected: dict[str, Any] = {}
         
         # Inicializar tracking de cobertura
         facet_coverage = self._init_facet_coverage(query_plan)
         
+        # Scores faceta × candidato en una matriz y, por faceta, los
+        # candidatos utilizables ordenados de mayor a menor score
+        score_matrix, facet_rows = self._facet_score_matrix(candidates, query_plan)
+        rankings = self._build_facet_rankings(score_matrix, facet_rows)
+        
         # Fase 1: Cubrir facetas required
-        selected, selected_ids = self._cover_required_facets(
-            candidates, query_plan, facet_coverage, selected, selected_ids
+        self._cover_required_facets(
+            candidates, query_plan, facet_coverage, selected,
+            score_matrix, rankings,
         )
         
         # Fase 2: Añadir chunks multi-faceta
-        selected, selected_ids = self._add_multi_facet_chunks(
-            candidates, query_plan, facet_coverage, selected, selected_ids
+        self._add_multi_facet_chunks(
+            candidates, query_plan, facet_coverage, selected,
+            score_matrix, facet_rows,
         )
         
         # Fase 3: Cubrir facetas optional si hay espacio
         if len(selected) < self.target_chunks:
-            selected, selected_ids = self._cover_optional_facets(
-                candidates, query_plan, facet_coverage, selected, selected_ids
+            self._cover_optional_facets(
+                candidates, query_plan, facet_coverage, selected,
+                score_matrix, rankings,
             )
         
         # Fase 4: Completar con chunks diversos de alto score
         if len(selected) < self.min_chunks:
-            selected, selected_ids = self._add_diverse_chunks(
-                candidates, selected, selected_ids
-            )
+            self._add_diverse_chunks(candidates, selected)
         
         # Fase 5: Preferir coherencia (mismo bloque)
-        selected = self._reorder_for_coherence(selected)
+        ordered = self._reorder_for_coherence(list(selected.values()))
         
         # Calcular métricas finales
-        return self._build_result(selected, facet_coverage, query_plan)
+        return self._build_result(ordered, facet_coverage, query_plan)
     
     def _init_facet_coverage(
         self,
@@ -184,108 +252,197 @@ class CoverageSelector:
             )
         return coverage
     
+    def _facet_score_matrix(
+        self,
+        candidates: list,
+        query_plan,
+    ) -> tuple[np.ndarray, dict[str, int]]:
+        """
+        Matriz [n_facetas, n_candidatos] con facet_scores (0.0 si falta).
+        
+        float64, igual que los scores originales: las comparaciones contra
+        los umbrales dan lo mismo que sobre los floats de Python.
+        
+        Returns:
+            (matriz, facet_id → fila)
+        """
+        facet_rows = {facet.facet_id: i for i, facet in enumerate(query_plan.facets)}
+        matrix = np.zeros((len(query_plan.facets), len(candidates)), dtype=np.float64)
+        
+        for col, candidate in enumerate(candidates):
+            for facet_id, score in candidate.facet_scores.items():
+                row = facet_rows.get(facet_id)
+                if row is not None:
+                    matrix[row, col] = score
+        
+        return matrix, facet_rows
+    
+    def _build_facet_rankings(
+        self,
+        score_matrix: np.ndarray,
+        facet_rows: dict[str, int],
+    ) -> dict[str, list[int]]:
+        """
+        Índices de candidatos por faceta, de mayor a menor score.
+        
+        Solo incluye scores > 0 y >= WEAK_THRESHOLD (los únicos que las
+        fases 1 y 3 pueden elegir). Orden estable: en empate, el primero.
+        """
+        if not facet_rows:
+            return {}
+        
+        order = np.argsort(-score_matrix, axis=1, kind="stable")
+        usable = ((score_matrix > 0.0) & (score_matrix >= WEAK_THRESHOLD)).sum(axis=1)
+        
+        return {
+            facet_id: order[row, :usable[row]].tolist()
+            for facet_id, row in facet_rows.items()
+        }
+    
     def _cover_required_facets(
         self,
         candidates: list,
         query_plan,
         facet_coverage: dict[str, FacetCoverage],
-        selected: list,
-        selected_ids: set[str],
-    ) -> tuple[list, set[str]]:
+        selected: dict[str, Any],
+        score_matrix: np.ndarray,
+        rankings: dict[str, list[int]],
+    ) -> None:
         """
         Fase 1: Asegurar que cada faceta required tenga al menos un chunk.
         
         Para cada faceta required:
-        - Buscar el chunk con mejor score para esa faceta
-        - Si no está seleccionado, añadirlo
+        - Tomar el primer chunk no seleccionado de su ranking (mejor
+          score >= WEAK_THRESHOLD; en empate, el primero)
+        - Añadirlo
         """
         for facet in query_plan.required_facets:
             if len(selected) >= self.max_chunks:
                 break
             
             # Buscar mejor chunk para esta faceta
-            best_chunk = None
-            best_score = 0.0
-            
-            for candidate in candidates:
-                if candidate.chunk_id in selected_ids:
-                    continue
-                
-                facet_score = candidate.facet_scores.get(facet.facet_id, 0.0)
-                if facet_score > best_score:
-                    best_score = facet_score
-                    best_chunk = candidate
+            best_idx = next(
+                (
+                    idx for idx in rankings[facet.facet_id]
+                    if candidates[idx].chunk_id not in selected
+                ),
+                None,
+            )
             
             # Añadir si encontramos uno bueno
-            if best_chunk and best_score >= WEAK_THRESHOLD:
-                selected.append(best_chunk)
-                selected_ids.add(best_chunk.chunk_id)
+            if best_idx is not None:
+                best_chunk = candidates[best_idx]
+                selected[best_chunk.chunk_id] = best_chunk
                 
                 # Actualizar cobertura
                 self._update_coverage(
-                    facet_coverage, best_chunk, query_plan
+                    facet_coverage, best_chunk, query_plan,
+                    score_matrix[:, best_idx].tolist(),
                 )
-        
-        return selected, selected_ids
     
     def _add_multi_facet_chunks(
         self,
         candidates: list,
         query_plan,
         facet_coverage: dict[str, FacetCoverage],
-        selected: list,
-        selected_ids: set[str],
-    ) -> tuple[list, set[str]]:
+        selected: dict[str, Any],
+        score_matrix: np.ndarray,
+        facet_rows: dict[str, int],
+    ) -> None:
         """
         Fase 2: Añadir chunks que cubren múltiples facetas.
         
-        Prioriza chunks que aportan cobertura a varias facetas
-        simultáneamente (eficiencia de evidencia).
-        """
-        # Calcular cuántas facetas cubre cada chunk
-        chunk_facet_counts = []
+        Greedy de set cover: en cada paso entra el chunk multi-faceta
+        (>= 2 facetas con score >= partial) que cubre más facetas aún
+        sin cubrir. Evaluación perezosa con heap: la ganancia solo puede
+        bajar, así que basta recalcularla al sacar cada entrada. Termina
+        al llegar al target o cuando ningún chunk aporta facetas nuevas.
         
-        for candidate in candidates:
-            if candidate.chunk_id in selected_ids:
+        Cada faceta del plan es un bit (su fila en score_matrix): la
+        ganancia de un chunk es popcount(cubre & sin_cubrir) con
+        int.bit_count.
+        """
+        uncovered = 0
+        for facet_id, cov in facet_coverage.items():
+            if not cov.is_covered:
+                uncovered |= 1 << facet_rows[facet_id]
+        
+        # Facetas que cubre cada chunk (score >= partial), de una vez
+        partial = score_matrix >= PARTIAL_THRESHOLD
+        counts = partial.sum(axis=0).tolist()
+        masks = self._facet_masks(partial)
+        
+        heap = []
+        for idx, (count, covers) in enumerate(zip(counts, masks)):
+            if count < 2 or candidates[idx].chunk_id in selected:
                 continue
             
-            # Contar facetas con score >= partial
-            covered_facets = sum(
-                1 for score in candidate.facet_scores.values()
-                if score >= PARTIAL_THRESHOLD
-            )
-            
-            if covered_facets >= 2:
-                chunk_facet_counts.append((candidate, covered_facets))
+            # Empates: más facetas en total, luego orden original
+            heap.append((-(covers & uncovered).bit_count(), -count, idx, covers))
         
-        # Ordenar por cantidad de facetas cubiertas
-        chunk_facet_counts.sort(key=lambda x: x[1], reverse=True)
+        heapq.heapify(heap)
         
-        # Añadir los mejores multi-faceta
-        for candidate, count in chunk_facet_counts:
-            if len(selected) >= self.target_chunks:
+        while heap and uncovered and len(selected) < self.target_chunks:
+            neg_gain, neg_count, idx, covers = heapq.heappop(heap)
+            
+            # Ganancia desactualizada: reinsertar con la actual
+            gain = (covers & uncovered).bit_count()
+            if gain != -neg_gain:
+                heapq.heappush(heap, (-gain, neg_count, idx, covers))
+                continue
+            
+            if not gain:
                 break
             
             # Verificar diversidad
-            if self._is_too_similar(candidate, selected):
+            candidate = candidates[idx]
+            if self._is_too_similar(candidate, selected.values()):
                 continue
             
-            selected.append(candidate)
-            selected_ids.add(candidate.chunk_id)
-            self._update_coverage(facet_coverage, candidate, query_plan)
+            selected[candidate.chunk_id] = candidate
+            self._update_coverage(
+                facet_coverage, candidate, query_plan,
+                score_matrix[:, idx].tolist(),
+            )
+            uncovered &= ~covers
+    
+    @staticmethod
+    def _facet_masks(partial: np.ndarray) -> list[int]:
+        """
+        Máscara de bits por candidato (bit = fila de faceta) a partir de
+        la matriz booleana [n_facetas, n_candidatos].
         
-        return selected, selected_ids
+        Hasta 63 facetas cabe en int64 y sale de un producto matricial;
+        con más, se arma con ints de Python (sin límite de bits).
+        """
+        n_facets = partial.shape[0]
+        if n_facets <= 63:
+            weights = np.left_shift(1, np.arange(n_facets, dtype=np.int64))
+            return (weights @ partial).tolist()
+        
+        masks = [0] * partial.shape[1]
+        for row, flags in enumerate(partial.tolist()):
+            bit = 1 << row
+            for idx, flag in enumerate(flags):
+                if flag:
+                    masks[idx] |= bit
+        return masks
     
     def _cover_optional_facets(
         self,
         candidates: list,
         query_plan,
         facet_coverage: dict[str, FacetCoverage],
-        selected: list,
-        selected_ids: set[str],
-    ) -> tuple[list, set[str]]:
+        selected: dict[str, Any],
+        score_matrix: np.ndarray,
+        rankings: dict[str, list[int]],
+    ) -> None:
         """
         Fase 3: Cubrir facetas optional si hay espacio.
+        
+        Recorre el ranking de la faceta (mayor a menor score) y toma el
+        primer candidato no seleccionado y suficientemente diverso: la
+        diversidad solo se calcula hasta encontrarlo.
         """
         for facet in query_plan.optional_facets:
             if len(selected) >= self.target_chunks:
@@ -295,49 +452,48 @@ class CoverageSelector:
             if facet_coverage[facet.facet_id].is_covered:
                 continue
             
-            # Buscar mejor chunk para esta faceta
-            best_chunk = None
-            best_score = 0.0
+            # Buscar mejor chunk para esta faceta (empates: orden original)
+            best_idx = None
             
-            for candidate in candidates:
-                if candidate.chunk_id in selected_ids:
+            for idx in rankings[facet.facet_id]:
+                candidate = candidates[idx]
+                if candidate.chunk_id in selected:
                     continue
                 
-                facet_score = candidate.facet_scores.get(facet.facet_id, 0.0)
-                if facet_score > best_score and facet_score >= WEAK_THRESHOLD:
-                    # Verificar diversidad
-                    if not self._is_too_similar(candidate, selected):
-                        best_score = facet_score
-                        best_chunk = candidate
+                # Verificar diversidad
+                if not self._is_too_similar(candidate, selected.values()):
+                    best_idx = idx
+                    break
             
-            if best_chunk:
-                selected.append(best_chunk)
-                selected_ids.add(best_chunk.chunk_id)
-                self._update_coverage(facet_coverage, best_chunk, query_plan)
-        
-        return selected, selected_ids
+            if best_idx is not None:
+                best_chunk = candidates[best_idx]
+                selected[best_chunk.chunk_id] = best_chunk
+                self._update_coverage(
+                    facet_coverage, best_chunk, query_plan,
+                    score_matrix[:, best_idx].tolist(),
+                )
     
     def _add_diverse_chunks(
         self,
         candidates: list,
-        selected: list,
-        selected_ids: set[str],
-    ) -> tuple[list, set[str]]:
+        selected: dict[str, Any],
+    ) -> None:
         """
         Fase 4: Completar con chunks diversos de alto score.
+        
+        El generador es perezoso: cada candidato se compara contra los
+        seleccionados en ese momento, y islice corta al llenar el cupo
+        sin recorrer el resto.
         """
-        for candidate in candidates:
-            if len(selected) >= self.min_chunks:
-                break
-            
-            if candidate.chunk_id in selected_ids:
-                continue
-            
-            if not self._is_too_similar(candidate, selected):
-                selected.append(candidate)
-                selected_ids.add(candidate.chunk_id)
+        remaining = max(self.min_chunks - len(selected), 0)
+        fresh = (
+            candidate for candidate in candidates
+            if candidate.chunk_id not in selected
+            and not self._is_too_similar(candidate, selected.values())
+        )
         
-        return selected, selected_ids
+        for candidate in islice(fresh, remaining):
+            selected[candidate.chunk_id] = candidate
     
     def _reorder_for_coherence(
         self,
@@ -351,33 +507,29 @@ class CoverageSelector:
         if len(selected) <= 2:
             return selected
         
-        # Agrupar por block_id
-        by_block: dict[str, list] = {}
+        # Agrupar por block_id, leyendo la posición una sola vez por chunk
+        by_block: dict[str, list[tuple[int, Any]]] = {}
         no_block = []
         
         for chunk in selected:
-            block_id = chunk.metadata.get("block_id", "")
+            get = chunk.metadata.get
+            block_id = get("block_id", "")
             if block_id:
-                if block_id not in by_block:
-                    by_block[block_id] = []
-                by_block[block_id].append(chunk)
+                by_block.setdefault(block_id, []).append(
+                    (get("position_in_block", 0), chunk)
+                )
             else:
                 no_block.append(chunk)
         
-        # Ordenar bloques por posición del primer chunk
-        sorted_blocks = sorted(
-            by_block.values(),
-            key=lambda chunks: chunks[0].metadata.get("position_in_block", 0)
-        )
+        # Ordenar bloques por posición del primer chunk (en orden de selección)
+        sorted_blocks = sorted(by_block.values(), key=lambda entries: entries[0][0])
         
         # Reconstruir lista
         reordered = []
-        for block_chunks in sorted_blocks:
-            # Ordenar chunks dentro del bloque por posición
-            block_chunks.sort(
-                key=lambda c: c.metadata.get("position_in_block", 0)
-            )
-            reordered.extend(block_chunks)
+        for entries in sorted_blocks:
+            # Ordenar chunks dentro del bloque por posición (estable)
+            entries.sort(key=itemgetter(0))
+            reordered.extend(map(itemgetter(1), entries))
         
         reordered.extend(no_block)
         
@@ -388,27 +540,33 @@ class CoverageSelector:
         facet_coverage: dict[str, FacetCoverage],
         chunk,
         query_plan,
+        scores: list[float],
     ) -> None:
-        """Actualiza tracking de cobertura con un chunk."""
-        for facet in query_plan.facets:
-            score = chunk.facet_scores.get(facet.facet_id, 0.0)
+        """
+        Actualiza tracking de cobertura con un chunk.
+        
+        `scores` es la columna del chunk en la matriz de _facet_score_matrix
+        (una por faceta, en el orden de query_plan.facets; 0.0 si falta),
+        así no se consulta facet_scores faceta a faceta.
+        
+        Trabaja sobre el rango del status (bisect_right sobre _THRESHOLDS,
+        umbrales inclusivos) para no pasar por el enum en cada faceta.
+        """
+        chunk_id = chunk.chunk_id
+        
+        for facet, score in zip(query_plan.facets, scores):
             cov = facet_coverage[facet.facet_id]
             
             # Actualizar mejor score
             if score > cov.best_score:
                 cov.best_score = score
             
-            # Actualizar status
-            if score >= STRONG_THRESHOLD:
-                cov.status = CoverageStatus.STRONG
-                cov.supporting_chunks.append(chunk.chunk_id)
-            elif score >= PARTIAL_THRESHOLD:
-                if cov.status != CoverageStatus.STRONG:
-                    cov.status = CoverageStatus.PARTIAL
-                cov.supporting_chunks.append(chunk.chunk_id)
-            elif score >= WEAK_THRESHOLD:
-                if cov.status == CoverageStatus.MISSING:
-                    cov.status = CoverageStatus.WEAK
+            # Actualizar status (solo sube) y chunks de soporte (>= partial)
+            rank = bisect_right(_THRESHOLDS, score)
+            if rank > _STATUS_RANK[cov.status]:
+                cov.status = _STATUSES[rank]
+            if rank >= _PARTIAL_RANK:
+                cov.supporting_chunks.append(chunk_id)
     
     def _is_too_similar(
         self,
@@ -419,26 +577,58 @@ class CoverageSelector:
         if not selected:
             return False
         
+        threshold = self.diversity_threshold
+        words = self._chunk_tokens(candidate)
+        n_words = len(words)
+        
         for sel in selected:
-            sim = self._text_similarity(candidate.content, sel.content)
-            if sim > self.diversity_threshold:
+            other = self._chunk_tokens(sel)
+            n_other = len(other)
+            
+            # Cota exacta: Jaccard <= min/max de los tamaños. Si la cota no
+            # supera el umbral, el par no puede ser similar (sin intersección)
+            if n_words and n_other and (
+                min(n_words, n_other) / max(n_words, n_other) <= threshold
+            ):
+                continue
+            
+            if self._jaccard(words, other) > threshold:
                 return True
         
         return False
     
-    def _text_similarity(self, text1: str, text2: str) -> float:
-        """Similitud simple por overlap de palabras."""
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
-        
+    def _chunk_tokens(self, chunk) -> frozenset[str]:
+        """
+        Palabras de un chunk: usa `tokens` del candidato si lo trae
+        (ScoredCandidate lo calcula una vez); si no, _tokens(content).
+        """
+        words = getattr(chunk, "tokens", None)
+        if words is None:
+            words = self._tokens(chunk.content)
+        return words
+    
+    def _tokens(self, text: str) -> frozenset[str]:
+        """Palabras en minúscula de un texto (memoizado por texto)."""
+        words = self._tok_cache.get(text)
+        if words is None:
+            words = self._tok_cache[text] = frozenset(text.lower().split())
+        return words
+    
+    @staticmethod
+    def _jaccard(words1: frozenset[str], words2: frozenset[str]) -> float:
+        """Jaccard entre dos conjuntos de palabras (0.0 si alguno está vacío)."""
         if not words1 or not words2:
             return 0.0
         
         intersection = len(words1 & words2)
-        union = len(words1 | words2)
+        union = len(words1) + len(words2) - intersection
         
         return intersection / union if union > 0 else 0.0
     
+    def _text_similarity(self, text1: str, text2: str) -> float:
+        """Similitud simple por overlap de palabras."""
+        return self._jaccard(self._tokens(text1), self._tokens(text2))
+    
     def _build_result(
         self,
         selected: list,
@@ -495,13 +685,11 @@ class CoverageSelector:
         if len(selected) <= 1:
             return 1.0
         
+        word_sets = [self._chunk_tokens(chunk) for chunk in selected]
         similarities = []
-        for i in range(len(selected)):
-            for j in range(i + 1, len(selected)):
-                sim = self._text_similarity(
-                    selected[i].content,
-                    selected[j].content
-                )
+        for i in range(len(word_sets)):
+            for j in range(i + 1, len(word_sets)):
+                sim = self._jaccard(word_sets[i], word_sets[j])
                 similarities.append(sim)
         
         if similarities:
@@ -511,16 +699,26 @@ class CoverageSelector:
         return 1.0
     
     def _compute_coherence(self, selected: list) -> float:
-        """Calcula score de coherencia (chunks del mismo bloque)."""
+        """
+        Calcula score de coherencia (chunks del mismo bloque).
+        
+        Proporción de pares (i, j) de chunks que comparten bloque:
+        sum(n_b²) / N². Vale 1.0 si todos están en un bloque y 1/N si
+        cada uno está en uno distinto; los chunks sin bloque no
+        comparten con nadie.
+        """
         if len(selected) <= 1:
             return 1.0
         
-        block_ids = [c.metadata.get("block_id", "") for c in selected]
-        unique_blocks = len(set(b for b in block_ids if b))
+        # Una sola pasada: chunks por bloque
+        block_counts = Counter(
+            block_id for c in selected
+            if (block_id := c.metadata.get("block_id", ""))
+        )
         
-        # Coherencia = chunks por bloque promedio
-        if unique_blocks > 0:
-            return len(selected) / unique_blocks / len(selected)
+        if block_counts:
+            total = len(selected)
+            return sum(n * n for n in block_counts.values()) / (total * total)
         
         return 0.5
     
@@ -21,6 +21,7 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass, field
+from functools import cached_property
 from typing import Optional
 from enum import Enum
 
@@ -67,12 +68,13 @@ class QueryPlan:
     navigation_context: Optional[dict] = None
     estimated_complexity: str = "medium"  # low, medium, high
     
-    @property
+    # Calculadas una vez: `facets` no se modifica tras crear el plan
+    @cached_property
     def required_facets(self) -> list[Facet]:
         """Facetas que deben tener cobertura."""
         return [f for f in self.facets if f.required]
     
-    @property
+    @cached_property
     def optional_facets(self) -> list[Facet]:
         """Facetas opcionales."""
         return [f for f in self.facets if not f.required]
@@ -17,6 +17,7 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass, field
+from functools import cached_property, singledispatch
 from typing import Optional
 import numpy as np
 
@@ -59,6 +60,11 @@ class ScoredCandidate:
     
     def __hash__(self):
         return hash(self.chunk_id)
+    
+    @cached_property
+    def tokens(self) -> frozenset[str]:
+        """Palabras en minúscula del contenido (calculado una vez)."""
+        return frozenset(self.content.lower().split())
 
 
 @dataclass 
@@ -89,11 +95,27 @@ SIMILARITY_THRESHOLD = 0.85  # Umbral para considerar redundante
 # FUNCIONES DE UTILIDAD
 # =============================================================================
 
-def cosine_similarity(vec1: list[float], vec2: list[float]) -> float:
-    """Calcula similitud coseno entre dos vectores."""
-    a = np.array(vec1)
-    b = np.array(vec2)
+@singledispatch
+def cosine_similarity(vec1, vec2) -> float:
+    """
+    Calcula similitud coseno entre dos vectores.
     
+    Listas (u otras secuencias) se convierten a ndarray; si el primer
+    vector ya es ndarray se usa la sobrecarga registrada, sin copia.
+    """
+    return _cosine_similarity_arrays(
+        np.asarray(vec1, dtype=np.float64),
+        np.asarray(vec2, dtype=np.float64),
+    )
+
+
+@cosine_similarity.register
+def _(vec1: np.ndarray, vec2) -> float:
+    return _cosine_similarity_arrays(vec1, np.asarray(vec2, dtype=np.float64))
+
+
+def _cosine_similarity_arrays(a: np.ndarray, b: np.ndarray) -> float:
+    """Similitud coseno entre dos ndarrays."""
     norm_a = np.linalg.norm(a)
     norm_b = np.linalg.norm(b)
     
@@ -265,6 +287,14 @@ class FusionScorer:
                 c.relevance_score = c.combined_retrieval_score
             return
         
+        # Convertir a ndarray una sola vez (no por par candidato-faceta)
+        content_embeddings = np.asarray(content_embeddings, dtype=np.float64)
+        facet_vectors = [
+            (facet, np.asarray(facet.query_embedding, dtype=np.float64))
+            for facet in query_plan.facets
+            if facet.query_embedding
+        ]
+        
         # Calcular similitud con cada faceta
         for i, candidate in enumerate(candidates):
             if i >= len(content_embeddings):
@@ -273,12 +303,11 @@ class FusionScorer:
             content_emb = content_embeddings[i]
             facet_scores = {}
             
-            for facet in query_plan.facets:
-                if facet.query_embedding:
-                    sim = cosine_similarity(content_emb, facet.query_embedding)
-                    # Aplicar peso de la faceta
-                    weighted_sim = sim * facet.weight
-                    facet_scores[facet.facet_id] = weighted_sim
+            for facet, facet_vec in facet_vectors:
+                sim = cosine_similarity(content_emb, facet_vec)
+                # Aplicar peso de la faceta
+                weighted_sim = sim * facet.weight
+                facet_scores[facet.facet_id] = weighted_sim
             
             candidate.facet_scores = facet_scores
             
@@ -344,11 +373,13 @@ class FusionScorer:
                     c.coherence_score = 0.5
                 return
             
+            content_embeddings = np.asarray(content_embeddings, dtype=np.float64)
+            topic_vec = np.asarray(topic_embedding, dtype=np.float64)
             for i, candidate in enumerate(candidates):
                 if i < len(content_embeddings):
                     candidate.coherence_score = cosine_similarity(
                         content_embeddings[i],
-                        topic_embedding
+                        topic_vec
                     )
             return
         
@@ -373,11 +404,13 @@ class FusionScorer:
             contents = [c.content for c in candidates]
             content_embeddings = self.embedder.embed_documents(contents)
             
+            content_embeddings = np.asarray(content_embeddings, dtype=np.float64)
+            coherence_vec = np.asarray(coherence_embedding, dtype=np.float64)
             for i, candidate in enumerate(candidates):
                 if i < len(content_embeddings):
                     candidate.coherence_score = cosine_similarity(
                         content_embeddings[i],
-                        coherence_embedding
+                        coherence_vec
                     )
         except Exception:
             for c in candidates:
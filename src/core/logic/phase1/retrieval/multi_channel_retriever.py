@@ -18,6 +18,7 @@ se refinan en el scorer y selector.
 from __future__ import annotations
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Any, Optional
 from enum import Enum
@@ -83,6 +84,14 @@ class ChannelWeight(Enum):
     CONTEXT_HEAVY = {"dense": 0.4, "sparse": 0.2, "parent": 0.4}
 
 
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+# Consultas vectoriales de facetas en paralelo
+MAX_PARALLEL_FACET_QUERIES = 8
+
+
 # =============================================================================
 # SPARSE RETRIEVER (BM25)
 # =============================================================================
@@ -360,8 +369,15 @@ class MultiChannelRetriever:
         
         complexity = query_plan.estimated_complexity
         
-        # Procesar cada faceta
-        for facet in query_plan.facets:
+        # Consultas vectoriales de todas las facetas (en paralelo)
+        vector_results = self._fetch_vector_results(
+            query_plan.facets,
+            source_id,
+            k_per_facet,
+        )
+        
+        # Procesar cada faceta (fusión en orden, sin concurrencia)
+        for facet_idx, facet in enumerate(query_plan.facets):
             facet_candidates = []
             facet_coverage[facet.facet_id] = []
             
@@ -371,13 +387,10 @@ class MultiChannelRetriever:
                 complexity,
             )
             
+            dense_results, parent_results = vector_results[facet_idx]
+            
             # 1. Dense retrieval
             if facet.query_embedding:
-                dense_results = self.index.search_chunks(
-                    query_embedding=facet.query_embedding,
-                    k=k_per_facet,
-                    filter_source=source_id,
-                )
                 channels_used.add("dense")
                 total_searched += len(dense_results)
                 
@@ -421,16 +434,9 @@ class MultiChannelRetriever:
             
             # 3. Parent retrieval (búsqueda en bloques)
             if self.enable_parent and facet.query_embedding:
-                parent_results = self.index.search_blocks(
-                    query_embedding=facet.query_embedding,
-                    k=3,
-                    filter_source=source_id,
-                )
                 channels_used.add("parent")
                 
-                for block_result in parent_results:
-                    # Obtener chunks de este bloque
-                    block_chunks = self.index.get_block_chunks(block_result.id)
+                for block_result, block_chunks in parent_results:
                     total_searched += len(block_chunks)
                     
                     for chunk_result in block_chunks:
@@ -471,6 +477,58 @@ class MultiChannelRetriever:
             channels_used=list(channels_used),
         )
     
+    def _fetch_vector_results(
+        self,
+        facets: list,
+        source_id: str,
+        k_per_facet: int,
+    ) -> list[tuple[list, list]]:
+        """
+        Ejecuta las búsquedas dense y parent de cada faceta.
+        
+        Las facetas son independientes, así que las consultas a ChromaDB
+        se lanzan en un pool de hilos (ChromaDB admite lecturas
+        concurrentes). Solo se paraleliza I/O: la fusión de candidatos
+        sigue siendo secuencial y en el orden de las facetas.
+        
+        Returns:
+            Por faceta: (dense_results, [(block_result, block_chunks), ...])
+        """
+        def fetch(facet) -> tuple[list, list]:
+            if not facet.query_embedding:
+                return [], []
+            
+            dense_results = self.index.search_chunks(
+                query_embedding=facet.query_embedding,
+                k=k_per_facet,
+                filter_source=source_id,
+            )
+            
+            parent_results = []
+            if self.enable_parent:
+                block_results = self.index.search_blocks(
+                    query_embedding=facet.query_embedding,
+                    k=3,
+                    filter_source=source_id,
+                )
+                for block_result in block_results:
+                    # Obtener chunks de este bloque
+                    parent_results.append(
+                        (block_result, self.index.get_block_chunks(block_result.id))
+                    )
+            
+            return dense_results, parent_results
+        
+        if len(facets) <= 1:
+            return [fetch(facet) for facet in facets]
+        
+        # Inicializar colecciones antes de compartir el índice entre hilos
+        self.index.ensure_collections()
+        
+        max_workers = min(MAX_PARALLEL_FACET_QUERIES, len(facets))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(fetch, facets))
+    
     def retrieve_for_single_query(
         self,
         query_embedding: list[float],
@@ -0,0 +1,97 @@
+"""
+conftest.py — Fixtures compartidas de los tests
+
+Los módulos se importan como `core.*` (igual que `make shell`, que
+trabaja desde src/), así que src/ se añade al path.
+
+Los embeddings de OpenAI se sustituyen por un cliente determinista:
+cada texto recibe un vector pseudoaleatorio derivado de su hash.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from core.logic.phase1.context_indexer import ContextIndexer
+from core.logic.phase1.indexing import multi_granular_embedder
+
+
+# =============================================================================
+# EMBEDDINGS FALSOS
+# =============================================================================
+
+FAKE_EMBEDDING_DIM = 32
+
+
+def fake_vector(text: str, dim: int = FAKE_EMBEDDING_DIM) -> list[float]:
+    """Vector determinista para un texto (mismo texto → mismo vector)."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).tolist()
+
+
+class FakeEmbeddings:
+    """
+    Sustituto de OpenAIEmbeddings (embed_documents / embed_query).
+
+    `query_vectors` fija el vector de queries concretas; el resto usa
+    fake_vector. Cuenta las llamadas para verificar los hits de caché.
+    """
+
+    def __init__(self, query_vectors: dict[str, list[float]] | None = None):
+        self.query_vectors = query_vectors or {}
+        self.document_calls = 0
+        self.query_calls = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.document_calls += 1
+        return [fake_vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.query_calls += 1
+        if text in self.query_vectors:
+            return list(self.query_vectors[text])
+        return fake_vector(text)
+
+
+# =============================================================================
+# FIXTURES
+# =============================================================================
+
+@pytest.fixture(autouse=True)
+def clear_embedding_cache():
+    """El cache de embeddings es global al proceso: aislar cada test."""
+    multi_granular_embedder._embedding_cache.clear()
+    yield
+    multi_granular_embedder._embedding_cache.clear()
+
+
+@pytest.fixture
+def make_indexer(tmp_path):
+    """Fábrica de ContextIndexer sobre un directorio temporal con FakeEmbeddings."""
+    def _make(name: str = "index", client: FakeEmbeddings | None = None, **kwargs) -> ContextIndexer:
+        indexer = ContextIndexer(db_path=tmp_path / name, **kwargs)
+        indexer.embedder._embeddings_client = client or FakeEmbeddings()
+        return indexer
+
+    return _make
+
+
+def make_document(n_sections: int = 6, sentences: int = 25, tag: str = "doc") -> str:
+    """Markdown con secciones y párrafos distintos (IDs de chunk únicos)."""
+    return "\n\n".join(
+        f"## Sección {tag} {i}\n\n"
+        + " ".join(
+            f"La frase {tag}-{i}-{j} trata del tema {j % 7} con detalle {i * j}."
+            for j in range(sentences)
+        )
+        for i in range(n_sections)
+    )
@@ -0,0 +1,221 @@
+"""
+Tests de la fase 2 de CoverageSelector (chunks multi-faceta).
+
+La referencia es el greedy de set cover sin evaluación perezosa: en
+cada paso se recalcula la ganancia de todos los candidatos con
+frozensets y se toma la mejor (empates: más facetas, luego orden
+original). El heap con máscaras de bits debe elegir lo mismo.
+"""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from core.logic.phase1.retrieval.coverage_selector import (
+    PARTIAL_THRESHOLD,
+    CoverageSelector,
+)
+from core.logic.phase1.retrieval.facet_query_planner import Facet, FacetType, QueryPlan
+from core.logic.phase1.retrieval.fusion_scorer import ScoredCandidate, ScoringResult
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+
+
+def _plan(n_facets: int, required: set[int] = frozenset()) -> QueryPlan:
+    return QueryPlan(
+        topic_name="tema",
+        facets=[
+            Facet(
+                facet_id=f"f{i}",
+                name=f"Faceta {i}",
+                facet_type=FacetType.KEY_CONCEPT,
+                intent="",
+                query_text=f"faceta {i}",
+                required=i in required,
+            )
+            for i in range(n_facets)
+        ],
+    )
+
+
+def _candidate(idx: int, scores: dict[str, float], content: str | None = None) -> ScoredCandidate:
+    return ScoredCandidate(
+        chunk_id=f"c{idx}",
+        content=content if content is not None else f"contenido único {idx}",
+        metadata={"block_id": f"b{idx % 3}", "position_in_block": idx},
+        facet_scores=scores,
+    )
+
+
+def _run_phase2(selector, candidates, plan, selected=None):
+    """Ejecuta la fase 2 del selector sobre una selección previa."""
+    selected = dict(selected or {})
+    coverage = selector._init_facet_coverage(plan)
+    score_matrix, facet_rows = selector._facet_score_matrix(candidates, plan)
+    for idx, candidate in enumerate(candidates):
+        if candidate.chunk_id in selected:
+            selector._update_coverage(coverage, candidate, plan, score_matrix[:, idx].tolist())
+
+    selector._add_multi_facet_chunks(candidates, plan, coverage, selected, score_matrix, facet_rows)
+    return list(selected), coverage
+
+
+def _reference_phase2(selector, candidates, plan, selected=None):
+    """Greedy ansioso con frozensets (sin heap ni máscaras)."""
+    selected = dict(selected or {})
+    facet_ids = [facet.facet_id for facet in plan.facets]
+
+    def covers(candidate):
+        return frozenset(
+            facet_id for facet_id in facet_ids
+            if candidate.facet_scores.get(facet_id, 0.0) >= PARTIAL_THRESHOLD
+        )
+
+    uncovered = set(facet_ids)
+    for candidate in selected.values():
+        uncovered -= covers(candidate)
+
+    pool = [
+        (idx, candidate, covers(candidate))
+        for idx, candidate in enumerate(candidates)
+        if len(covers(candidate)) >= 2 and candidate.chunk_id not in selected
+    ]
+
+    while pool and uncovered and len(selected) < selector.target_chunks:
+        best = max(pool, key=lambda e: (len(e[2] & uncovered), len(e[2]), -e[0]))
+        if not best[2] & uncovered:
+            break
+        pool.remove(best)
+
+        _, candidate, candidate_covers = best
+        if selector._is_too_similar(candidate, selected.values()):
+            continue
+
+        selected[candidate.chunk_id] = candidate
+        uncovered -= candidate_covers
+
+    return list(selected), uncovered
+
+
+def _random_case(rng: random.Random):
+    n_facets = rng.randint(0, 8)
+    plan = _plan(n_facets)
+    levels = (0.0, 0.1, 0.3, 0.39, 0.4, 0.55, 0.7, 0.9)
+    candidates = [
+        _candidate(
+            idx,
+            {
+                f"f{i}": rng.choice(levels)
+                for i in range(n_facets) if rng.random() < 0.7
+            },
+            content=" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 6))),
+        )
+        for idx in range(rng.randint(0, 30))
+    ]
+    preselected = {c.chunk_id: c for c in rng.sample(candidates, min(len(candidates), rng.randint(0, 2)))}
+    selector = CoverageSelector(
+        target_chunks=rng.randint(1, 10),
+        diversity_threshold=rng.choice((0.3, 0.6, 1.0)),
+    )
+    return selector, candidates, plan, preselected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_lazy_greedy_matches_eager_greedy(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        selector, candidates, plan, preselected = _random_case(rng)
+
+        selected, coverage = _run_phase2(selector, candidates, plan, preselected)
+        expected, uncovered = _reference_phase2(selector, candidates, plan, preselected)
+
+        assert selected == expected
+        assert {
+            facet_id for facet_id, cov in coverage.items() if not cov.is_covered
+        } == uncovered
+
+
+def test_skips_chunks_whose_facets_are_already_covered():
+    plan = _plan(4)
+    candidates = [
+        _candidate(0, {"f0": 0.9, "f1": 0.9, "f2": 0.9}),
+        _candidate(1, {"f0": 0.8, "f1": 0.8, "f2": 0.8}),  # Repite facetas
+        _candidate(2, {"f2": 0.5, "f3": 0.5}),
+    ]
+
+    selected, coverage = _run_phase2(CoverageSelector(target_chunks=8), candidates, plan)
+
+    assert selected == ["c0", "c2"]
+    assert all(cov.is_covered for cov in coverage.values())
+
+
+def test_stops_at_zero_gain(monkeypatch):
+    plan = _plan(3)
+    candidates = [
+        _candidate(0, {"f0": 0.9, "f1": 0.9}),
+        _candidate(1, {"f0": 0.7, "f1": 0.7}),
+        _candidate(2, {"f0": 0.6, "f1": 0.5}),
+    ]
+    selector = CoverageSelector(target_chunks=8)
+
+    checked = []
+    original = selector._is_too_similar
+    monkeypatch.setattr(
+        selector, "_is_too_similar",
+        lambda candidate, selected: checked.append(candidate.chunk_id) or original(candidate, selected),
+    )
+
+    # f2 no la cubre nadie: tras c0 la mejor ganancia es 0 y la fase termina
+    selected, coverage = _run_phase2(selector, candidates, plan)
+
+    assert selected == ["c0"]
+    assert checked == ["c0"]
+    assert not coverage["f2"].is_covered
+
+
+def test_stops_at_target():
+    plan = _plan(6)
+    candidates = [
+        _candidate(i, {f"f{2 * i}": 0.9, f"f{2 * i + 1}": 0.9})
+        for i in range(3)
+    ]
+
+    selected, _ = _run_phase2(CoverageSelector(target_chunks=2), candidates, plan)
+    assert selected == ["c0", "c1"]
+
+
+def test_more_than_63_facets_use_python_ints():
+    plan = _plan(70)
+    candidates = [
+        _candidate(0, {"f1": 0.9, "f65": 0.9}),
+        _candidate(1, {"f65": 0.9, "f69": 0.9, "f2": 0.9}),
+        _candidate(2, {"f1": 0.9, "f65": 0.9, "f69": 0.9}),
+    ]
+    selector = CoverageSelector(target_chunks=8)
+
+    assert _run_phase2(selector, candidates, plan)[0] == _reference_phase2(selector, candidates, plan)[0]
+
+
+def test_select_end_to_end_keeps_multi_facet_choice():
+    plan = _plan(4, required={0})
+    candidates = [
+        _candidate(0, {"f0": 0.9}),
+        _candidate(1, {"f1": 0.8, "f2": 0.8}),
+        _candidate(2, {"f1": 0.7, "f2": 0.7}),
+        _candidate(3, {"f2": 0.6, "f3": 0.6}),
+    ]
+    scoring = ScoringResult(
+        candidates=candidates,
+        facet_coverage={},
+        diversity_score=1.0,
+        avg_relevance=0.0,
+        avg_coherence=0.0,
+    )
+
+    result = CoverageSelector(target_chunks=3, min_chunks=1).select(scoring, plan)
+
+    assert {c.chunk_id for c in result.selected_chunks} == {"c0", "c1", "c3"}
+    assert result.is_complete
+    assert result.optional_coverage_pct == 1.0
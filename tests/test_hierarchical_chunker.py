@@ -0,0 +1,61 @@
+"""
+Tests del chunking en paralelo de HierarchicalChunker.
+
+La referencia es el chunking en serie (max_workers=1, el valor por
+defecto): el pool de procesos debe producir el mismo documento.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict
+
+import pytest
+
+from conftest import make_document
+from core.logic.phase1.indexing import hierarchical_chunker
+from core.logic.phase1.indexing.hierarchical_chunker import (
+    PARALLEL_MIN_BLOCKS,
+    HierarchicalChunker,
+)
+
+
+def _dump(document) -> tuple[list[dict], list[dict]]:
+    return [asdict(b) for b in document.blocks], [asdict(c) for c in document.chunks]
+
+
+def _forbid_process_pool(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("no debería lanzarse un pool de procesos")
+
+    monkeypatch.setattr(hierarchical_chunker, "ProcessPoolExecutor", fail)
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(800, 150), (300, 50)])
+def test_parallel_matches_serial(chunk_size, chunk_overlap):
+    text = make_document(n_sections=PARALLEL_MIN_BLOCKS + 5, sentences=30)
+
+    serial = HierarchicalChunker(chunk_size, chunk_overlap).chunk_document(text, "doc")
+    parallel = HierarchicalChunker(chunk_size, chunk_overlap, max_workers=2).chunk_document(text, "doc")
+
+    assert len(serial.blocks) >= PARALLEL_MIN_BLOCKS
+    assert _dump(parallel) == _dump(serial)
+
+
+def test_serial_by_default(monkeypatch):
+    _forbid_process_pool(monkeypatch)
+
+    chunker = HierarchicalChunker()
+    document = chunker.chunk_document(make_document(n_sections=PARALLEL_MIN_BLOCKS + 5), "doc")
+
+    assert chunker.max_workers == 1
+    assert len(document.blocks) >= PARALLEL_MIN_BLOCKS
+
+
+def test_small_documents_skip_the_pool(monkeypatch):
+    _forbid_process_pool(monkeypatch)
+
+    text = make_document(n_sections=2)
+    document = HierarchicalChunker(max_workers=4).chunk_document(text, "doc")
+
+    assert len(document.blocks) < PARALLEL_MIN_BLOCKS
+    assert _dump(document) == _dump(HierarchicalChunker().chunk_document(text, "doc"))
@@ -0,0 +1,190 @@
+"""
+Tests de HierarchicalIndex sobre ChromaDB real (directorio temporal).
+
+La referencia es el HierarchicalDocument que produce el chunker.
+"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from conftest import make_document
+from core.logic.phase1 import context_indexer
+from core.logic.phase1.indexing import hierarchical_index
+from core.logic.phase1.indexing.hierarchical_index import _chunk_ids_from_metadata
+
+SOURCE_ID = "doc"
+
+
+@pytest.fixture
+def indexed(make_indexer):
+    indexer = make_indexer()
+    text = make_document(n_sections=8)
+    original = indexer.chunker.chunk_document(text, SOURCE_ID)
+    indexer.index(SOURCE_ID, text)
+    return indexer, original
+
+
+# =============================================================================
+# load_document
+# =============================================================================
+
+def test_load_document_rebuilds_hierarchy(indexed):
+    indexer, original = indexed
+    loaded = indexer.get_index(SOURCE_ID).load_document(SOURCE_ID)
+
+    assert loaded.source_id == SOURCE_ID
+
+    # Bloques: misma jerarquía; el contenido es el resumen indexado
+    assert [
+        (b.block_id, b.block_type, b.heading, b.chunk_ids, b.position_in_doc,
+         b.prev_block_id, b.next_block_id, b.content)
+        for b in loaded.blocks
+    ] == [
+        (b.block_id, b.block_type, b.heading, b.chunk_ids, b.position_in_doc,
+         b.prev_block_id, b.next_block_id, b.summary)
+        for b in original.blocks
+    ]
+
+    # Chunks: mismo orden, contenido y punteros (sin char_start/char_end)
+    assert [
+        (c.chunk_id, c.content, c.block_id, c.position_in_block,
+         c.total_in_block, c.prev_chunk_id, c.next_chunk_id)
+        for c in loaded.chunks
+    ] == [
+        (c.chunk_id, c.content, c.block_id, c.position_in_block,
+         c.total_in_block, c.prev_chunk_id, c.next_chunk_id)
+        for c in original.chunks
+    ]
+
+    first = original.chunks[0].chunk_id
+    assert loaded.get_parent(first).block_id == original.get_parent(first).block_id
+
+
+def test_load_document_unknown_source(indexed):
+    indexer, _ = indexed
+    assert indexer.get_index(SOURCE_ID).load_document("otra") is None
+
+
+def test_get_document_keeps_recent_documents(indexed):
+    indexer, original = indexed
+
+    document = indexer.get_document(SOURCE_ID)
+    # Documento original del chunker: conserva offsets y contenido completo
+    assert [(c.chunk_id, c.char_start, c.char_end) for c in document.chunks] == [
+        (c.chunk_id, c.char_start, c.char_end) for c in original.chunks
+    ]
+    assert [b.content for b in document.blocks] == [b.content for b in original.blocks]
+
+
+def test_get_document_reloads_after_eviction(indexed, monkeypatch):
+    indexer, original = indexed
+    monkeypatch.setattr(context_indexer, "DOCUMENT_CACHE_SIZE", 1)
+
+    indexer.index("otra", make_document(n_sections=2, tag="otra"))
+    assert SOURCE_ID not in indexer._indexed_docs
+
+    document = indexer.get_document(SOURCE_ID)
+    assert [c.chunk_id for c in document.chunks] == [c.chunk_id for c in original.chunks]
+    assert indexer.get_document(SOURCE_ID) is document
+    assert list(indexer._indexed_docs) == [SOURCE_ID]
+
+
+# =============================================================================
+# METADATA DE BLOQUES (chunk_ids: JSON v1 → CSV v2)
+# =============================================================================
+
+def _legacy_metadata(metadata: dict) -> dict:
+    """Metadata de un bloque tal como la escribían índices anteriores (v1)."""
+    legacy = {
+        key: value for key, value in metadata.items()
+        if key not in ("chunk_ids_csv", "metadata_version")
+    }
+    legacy["chunk_ids_json"] = json.dumps(_chunk_ids_from_metadata(metadata))
+    return legacy
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    if request.param and not hierarchical_index.HAS_ORJSON:
+        pytest.skip("orjson no instalado")
+    monkeypatch.setattr(hierarchical_index, "HAS_ORJSON", request.param)
+
+
+@pytest.mark.parametrize("chunk_ids", [
+    ["chk_000_a1b2c3d4"],
+    ["chk_000_a1b2c3d4", "chk_000_e5f6a7b8", "chk_001_c9d0e1f2"],
+    [],
+])
+def test_csv_and_legacy_json_read_the_same(chunk_ids, json_backend):
+    current = {"chunk_ids_csv": ",".join(chunk_ids), "metadata_version": 2}
+    legacy = {"chunk_ids_json": json.dumps(chunk_ids)}
+
+    assert _chunk_ids_from_metadata(current) == chunk_ids
+    assert _chunk_ids_from_metadata(legacy) == json.loads(legacy["chunk_ids_json"])
+
+
+def test_legacy_metadata_edge_cases(json_backend):
+    # Sin versión ni campo: bloque sin chunks
+    assert _chunk_ids_from_metadata({}) == []
+    # JSON corrupto: se ignora como antes
+    assert _chunk_ids_from_metadata({"chunk_ids_json": "[chk_000"}) == []
+    # La versión manda aunque quede el campo JSON
+    assert _chunk_ids_from_metadata({
+        "metadata_version": 2,
+        "chunk_ids_csv": "a,b",
+        "chunk_ids_json": '["x"]',
+    }) == ["a", "b"]
+
+
+def test_new_blocks_are_written_as_version_2(indexed):
+    indexer, original = indexed
+    stored = indexer.get_index(SOURCE_ID).blocks_collection.get(include=["metadatas"])
+
+    for metadata in stored["metadatas"]:
+        assert metadata["metadata_version"] == hierarchical_index._METADATA_VERSION
+        assert "chunk_ids_json" not in metadata
+
+    by_id = {b.block_id: b.chunk_ids for b in original.blocks}
+    assert {
+        metadata["block_id"]: metadata["chunk_ids_csv"].split(",")
+        for metadata in stored["metadatas"]
+    } == by_id
+
+
+def test_legacy_index_reads_like_current(indexed):
+    indexer, _ = indexed
+    index = indexer.get_index(SOURCE_ID)
+
+    expected_document = index.load_document(SOURCE_ID)
+    block_ids = [b.block_id for b in expected_document.blocks]
+    expected_chunks = {
+        block_id: [c.id for c in index.get_block_chunks(block_id)]
+        for block_id in block_ids
+    }
+
+    # Reescribir los bloques con la metadata v1 (update() fusiona claves)
+    stored = index.blocks_collection.get(include=["documents", "metadatas", "embeddings"])
+    index.blocks_collection.delete(ids=stored["ids"])
+    index.blocks_collection.add(
+        ids=stored["ids"],
+        embeddings=stored["embeddings"],
+        documents=stored["documents"],
+        metadatas=[_legacy_metadata(m) for m in stored["metadatas"]],
+    )
+    index.invalidate()
+    assert "metadata_version" not in index.blocks_collection.get(
+        ids=[block_ids[0]], include=["metadatas"],
+    )["metadatas"][0]
+
+    assert {
+        block_id: [c.id for c in index.get_block_chunks(block_id)]
+        for block_id in block_ids
+    } == expected_chunks
+
+    legacy_document = index.load_document(SOURCE_ID)
+    assert [b.chunk_ids for b in legacy_document.blocks] == [
+        b.chunk_ids for b in expected_document.blocks
+    ]
@@ -0,0 +1,109 @@
+"""
+Tests de ContextIndexer.index_many.
+
+La referencia es indexar cada documento por separado con index(): el
+contenido de ChromaDB y las estadísticas deben coincidir.
+"""
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+import pytest
+
+from conftest import FakeEmbeddings, make_document
+from core.logic.phase1.indexing import multi_granular_embedder
+
+DOCUMENTS = [
+    ("alpha", make_document(n_sections=4, tag="alpha"), None),
+    ("beta", make_document(n_sections=2, sentences=40, tag="beta"), None),
+    ("gamma", make_document(n_sections=7, sentences=10, tag="gamma"), None),
+]
+
+# Varían entre ejecuciones: se comparan aparte
+VOLATILE_STATS = ("elapsed_seconds", "db_path")
+
+
+def _stored(indexer, source_id: str) -> dict:
+    index = indexer.get_index(source_id)
+    include = ["documents", "metadatas", "embeddings"]
+    return {
+        name: collection.get(include=include)
+        for name, collection in (
+            ("chunks", index.chunks_collection),
+            ("blocks", index.blocks_collection),
+        )
+    }
+
+
+def _assert_same_collection(actual: dict, expected: dict) -> None:
+    order_actual = np.argsort(actual["ids"])
+    order_expected = np.argsort(expected["ids"])
+
+    assert [actual["ids"][i] for i in order_actual] == [expected["ids"][i] for i in order_expected]
+    assert [actual["documents"][i] for i in order_actual] == [expected["documents"][i] for i in order_expected]
+    assert [actual["metadatas"][i] for i in order_actual] == [expected["metadatas"][i] for i in order_expected]
+    np.testing.assert_array_equal(
+        np.asarray(actual["embeddings"])[order_actual],
+        np.asarray(expected["embeddings"])[order_expected],
+    )
+
+
+def _stable(stats: dict) -> dict:
+    return {key: value for key, value in stats.items() if key not in VOLATILE_STATS}
+
+
+@pytest.fixture
+def batch_and_single(make_indexer):
+    batch = make_indexer("batch")
+    single = make_indexer("single")
+
+    batch_stats = batch.index_many(DOCUMENTS)
+    single_stats = [single.index(source_id, text, metadata) for source_id, text, metadata in DOCUMENTS]
+    return batch, batch_stats, single, single_stats
+
+
+def test_index_many_matches_index_per_document(batch_and_single):
+    batch, batch_stats, single, single_stats = batch_and_single
+
+    assert [_stable(s) for s in batch_stats] == [_stable(s) for s in single_stats]
+
+    for source_id, _, _ in DOCUMENTS:
+        actual = _stored(batch, source_id)
+        expected = _stored(single, source_id)
+        _assert_same_collection(actual["chunks"], expected["chunks"])
+        _assert_same_collection(actual["blocks"], expected["blocks"])
+
+
+def test_index_many_shares_embedding_calls(make_indexer):
+    batch_client = FakeEmbeddings()
+    make_indexer("batch", client=batch_client).index_many(DOCUMENTS)
+
+    multi_granular_embedder._embedding_cache.clear()
+
+    single_client = FakeEmbeddings()
+    single = make_indexer("single", client=single_client)
+    for source_id, text, metadata in DOCUMENTS:
+        single.index(source_id, text, metadata)
+
+    assert batch_client.document_calls < single_client.document_calls
+
+
+def test_elapsed_seconds_is_per_document(make_indexer):
+    indexer = make_indexer()
+
+    start = time.perf_counter()
+    stats = indexer.index_many(DOCUMENTS)
+    wall = time.perf_counter() - start
+
+    elapsed = [s["elapsed_seconds"] for s in stats]
+    assert all(seconds > 0 for seconds in elapsed)
+    # Cada documento cuenta solo su parte: la suma no supera el lote
+    assert sum(elapsed) <= wall
+
+
+def test_index_many_empty():
+    from core.logic.phase1.context_indexer import ContextIndexer
+
+    assert ContextIndexer().index_many([]) == []
@@ -0,0 +1,144 @@
+"""
+Tests de la búsqueda int8 con re-ranking float32 (HierarchicalIndex).
+
+La referencia es la búsqueda exacta: coseno float32 contra todos los
+embeddings de chunks guardados en ChromaDB.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from conftest import fake_vector, make_document
+from core.logic.phase1.indexing.hierarchical_index import ADD_BATCH_SIZE, HierarchicalIndex
+from core.logic.phase1.indexing.multi_granular_embedder import quantize_int8_rows
+
+SOURCE_ID = "doc"
+QUERIES = ("tema 1", "detalle 12", "frase doc-3-7", "otra consulta", "sección")
+
+
+def _exact_top_k(index: HierarchicalIndex, query: list[float], k: int) -> list[tuple[str, float]]:
+    stored = index.chunks_collection.get(include=["embeddings"])
+    vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+    q = np.asarray(query, dtype=np.float32)
+    scores = (vectors @ q) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(q))
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [(stored["ids"][i], float(scores[i])) for i in order]
+
+
+@pytest.fixture
+def quantized_index(make_indexer):
+    indexer = make_indexer(enable_quantization=True)
+    indexer.index(SOURCE_ID, make_document(n_sections=60))
+    return indexer.get_index(SOURCE_ID)
+
+
+def test_quantized_search_matches_exact_cosine(quantized_index):
+    assert quantized_index.quantized_path.exists()
+
+    for text in QUERIES:
+        query = fake_vector(text)
+        for k in (1, 5, 10):
+            results = quantized_index.search_chunks(query, k=k, filter_source=SOURCE_ID)
+            expected = _exact_top_k(quantized_index, query, k)
+
+            assert [r.id for r in results] == [doc_id for doc_id, _ in expected]
+            assert [r.score for r in results] == pytest.approx(
+                [score for _, score in expected], abs=1e-5,
+            )
+
+
+def test_quantized_results_carry_content_and_metadata(quantized_index):
+    results = quantized_index.search_chunks(fake_vector("tema 1"), k=3)
+    by_id = quantized_index.get_chunks_by_ids([r.id for r in results])
+
+    for result in results:
+        assert result.granularity == "chunk"
+        assert result.content == by_id[result.id].content
+        assert result.metadata == by_id[result.id].metadata
+
+
+def test_other_source_falls_back_to_vector_search(quantized_index, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("la copia int8 solo cubre la fuente del índice")
+
+    monkeypatch.setattr(quantized_index, "_search_chunks_quantized", fail)
+    assert quantized_index.search_chunks(fake_vector("tema 1"), k=3, filter_source="otra") == []
+
+
+def test_append_keeps_existing_codes(tmp_path):
+    index = HierarchicalIndex(tmp_path, SOURCE_ID, enable_quantization=True)
+    rng = np.random.default_rng(0)
+    first = rng.standard_normal((50, 16)).astype(np.float32)
+    second = rng.standard_normal((20, 16)).astype(np.float32)
+    first_ids = [f"a{i}" for i in range(50)]
+
+    index._write_quantized_chunks(first_ids, first)
+    codes_before = index._quantized[1].copy()
+
+    # Re-escribir a0..a4 y añadir b0..b14
+    new_ids = first_ids[:5] + [f"b{i}" for i in range(15)]
+    index._write_quantized_chunks(new_ids, second)
+    index._quantized = None  # Forzar lectura desde disco
+    ids, codes, scale = index._load_quantized()
+
+    assert ids == first_ids[5:] + new_ids
+    np.testing.assert_array_equal(codes[:45], codes_before[5:])
+
+    normalized = second / np.linalg.norm(second, axis=1, keepdims=True)
+    expected_codes, expected_scale = quantize_int8_rows(normalized)
+    np.testing.assert_array_equal(codes[45:], expected_codes)
+    np.testing.assert_array_equal(scale[45:], expected_scale)
+
+
+def test_delete_source_drops_quantized_copy(quantized_index):
+    quantized_index.delete_source(SOURCE_ID)
+
+    assert not quantized_index.quantized_path.exists()
+    assert quantized_index.search_chunks(fake_vector("tema 1"), k=3) == []
+
+
+def test_legacy_per_column_file_is_converted(quantized_index):
+    # Archivo anterior: escala y zero_point por columna
+    ids, codes, scale = quantized_index._load_quantized()
+    matrix = codes.astype(np.float32) * scale[:, None]
+    col_min, col_max = matrix.min(axis=0), matrix.max(axis=0)
+    col_scale = np.where(col_max > col_min, (col_max - col_min) / 255.0, 1).astype(np.float32)
+    zero_point = (col_min + 128.0 * col_scale).astype(np.float32)
+    col_codes = np.clip(np.rint((matrix - zero_point) / col_scale), -128, 127).astype(np.int8)
+    np.savez(
+        quantized_index.quantized_path,
+        ids=np.asarray(ids),
+        codes=col_codes,
+        scale=col_scale,
+        zero_point=zero_point,
+    )
+    quantized_index._quantized = None
+
+    loaded_ids, loaded_codes, loaded_scale = quantized_index._load_quantized()
+    assert loaded_ids == ids
+    assert loaded_scale.shape == (len(ids),)
+
+    query = fake_vector("tema 1")
+    results = quantized_index.search_chunks(query, k=5)
+    assert [r.id for r in results] == [doc_id for doc_id, _ in _exact_top_k(quantized_index, query, 5)]
+
+
+def test_batched_indexing_matches_whole_matrix(make_indexer):
+    indexer = make_indexer(enable_quantization=True)
+    stats = indexer.index(SOURCE_ID, make_document(n_sections=130))
+    index = indexer.get_index(SOURCE_ID)
+    assert stats["chunks_indexed"] > ADD_BATCH_SIZE  # Varios lotes
+
+    stored = index.chunks_collection.get(include=["embeddings"])
+    vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+    expected_codes, expected_scale = index._quantize_chunk_rows(vectors)
+
+    index._quantized = None
+    ids, codes, scale = index._load_quantized()
+    rows = [stored["ids"].index(chunk_id) for chunk_id in ids]
+
+    assert sorted(ids) == sorted(stored["ids"])
+    np.testing.assert_array_equal(codes, expected_codes[rows])
+    np.testing.assert_allclose(scale, expected_scale[rows], rtol=1e-6)
@@ -0,0 +1,177 @@
+"""
+Tests del cache de búsquedas de ContextIndexer (exacto + semántico).
+
+La referencia es la búsqueda sin cache: embedding de la query y
+HierarchicalIndex.search_chunks filtrado por fuente.
+"""
+
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from conftest import FAKE_EMBEDDING_DIM, FakeEmbeddings, make_document
+from core.logic.phase1.context_indexer import SEMANTIC_CACHE_THRESHOLD, _SearchCache
+from core.logic.phase1.indexing.hierarchical_index import SearchResult
+
+SOURCE_ID = "doc"
+
+
+def _unit(*head: float) -> list[float]:
+    return list(head) + [0.0] * (FAKE_EMBEDDING_DIM - len(head))
+
+
+def _at_similarity(similarity: float) -> list[float]:
+    """Vector unitario con coseno `similarity` respecto a _unit(1.0)."""
+    return _unit(similarity, math.sqrt(1 - similarity * similarity))
+
+
+def _results(*ids: str) -> list[SearchResult]:
+    return [
+        SearchResult(id=doc_id, content="", score=1.0, metadata={}, granularity="chunk")
+        for doc_id in ids
+    ]
+
+
+def _uncached_search(indexer, query: str, k: int):
+    index = indexer.get_index(SOURCE_ID)
+    query_embedding = indexer.embedder.embed_query(query)
+    return index.search_chunks(query_embedding, k=k, filter_source=SOURCE_ID)
+
+
+def _summary(results):
+    return [(r.id, r.content, round(r.score, 6), dict(r.metadata)) for r in results]
+
+
+@pytest.fixture
+def indexed(make_indexer):
+    client = FakeEmbeddings(query_vectors={
+        "base": _unit(1.0),
+        "just above": _at_similarity(0.9701),
+        "just below": _at_similarity(0.9699),
+    })
+    indexer = make_indexer(client=client)
+    indexer.index(SOURCE_ID, make_document())
+    return indexer, client
+
+
+def test_cached_search_matches_uncached(indexed):
+    indexer, _ = indexed
+
+    for query in ("tema 3 con detalle", "frase doc-2-4", "base"):
+        for k in (1, 5):
+            expected = _summary(_uncached_search(indexer, query, k))
+            assert _summary(indexer.search(SOURCE_ID, query, k=k)) == expected
+            # Segunda vez desde el cache: mismo resultado
+            assert _summary(indexer.search(SOURCE_ID, query, k=k)) == expected
+
+
+def test_exact_hit_skips_embedding_and_vector_search(indexed, monkeypatch):
+    indexer, client = indexed
+    index = indexer.get_index(SOURCE_ID)
+
+    first = indexer.search(SOURCE_ID, "Tema 3 con detalle", k=4)
+    query_calls = client.query_calls
+
+    def fail(*args, **kwargs):
+        raise AssertionError("búsqueda vectorial en un hit exacto")
+
+    monkeypatch.setattr(index, "search_chunks", fail)
+
+    # La clave normaliza espacios y mayúsculas
+    again = indexer.search(SOURCE_ID, "  tema 3 CON detalle ", k=4)
+
+    assert _summary(again) == _summary(first)
+    assert client.query_calls == query_calls
+
+
+def test_semantic_hit_just_above_threshold(indexed, monkeypatch):
+    indexer, _ = indexed
+    index = indexer.get_index(SOURCE_ID)
+
+    base = indexer.search(SOURCE_ID, "base", k=3)
+
+    calls = []
+    original = index.search_chunks
+    monkeypatch.setattr(
+        index, "search_chunks",
+        lambda *args, **kwargs: calls.append(args) or original(*args, **kwargs),
+    )
+
+    # Coseno 0.9701 >= 0.97: reutiliza los resultados de "base"
+    assert _summary(indexer.search(SOURCE_ID, "just above", k=3)) == _summary(base)
+    assert calls == []
+
+    # Coseno 0.9699 < 0.97: búsqueda real, igual a la búsqueda sin cache
+    below = indexer.search(SOURCE_ID, "just below", k=3)
+    assert len(calls) == 1
+    assert _summary(below) == _summary(_uncached_search(indexer, "just below", 3))
+
+
+def test_semantic_lookup_respects_source_and_k():
+    cache = _SearchCache()
+    cache.put(cache.make_key("a", "base", 3), _unit(1.0), _results("resultado"))
+
+    near = _at_similarity(0.99)
+    assert cache.get_similar("a", 3, near) == _results("resultado")
+    assert cache.get_similar("a", 5, near) is None
+    assert cache.get_similar("b", 3, near) is None
+
+
+def test_threshold_is_inclusive_for_unit_vectors():
+    cache = _SearchCache()
+    cache.put(cache.make_key("a", "base", 3), _unit(1.0), _results("resultado"))
+
+    assert SEMANTIC_CACHE_THRESHOLD == 0.97
+    assert cache.get_similar("a", 3, _at_similarity(0.9701)) == _results("resultado")
+    assert cache.get_similar("a", 3, _at_similarity(0.9699)) is None
+
+
+def test_expired_entries_are_not_reused(monkeypatch):
+    import core.logic.phase1.context_indexer as context_indexer
+
+    now = [1000.0]
+    monkeypatch.setattr(context_indexer.time, "monotonic", lambda: now[0])
+
+    cache = _SearchCache(ttl=10)
+    key = cache.make_key("a", "base", 3)
+    cache.put(key, _unit(1.0), _results("resultado"))
+
+    now[0] += 5
+    assert cache.get(key) == _results("resultado")
+
+    now[0] += 10
+    assert cache.get_similar("a", 3, _unit(1.0)) is None
+    assert cache.get(key) is None
+
+
+def test_reindexing_invalidates_cached_results(indexed):
+    indexer, _ = indexed
+
+    indexer.search(SOURCE_ID, "tema 3 con detalle", k=3)
+    assert indexer._search_cache._entries
+
+    indexer.index(SOURCE_ID, make_document(tag="nuevo"))
+    assert not indexer._search_cache._entries
+
+
+def test_mutating_results_does_not_affect_later_hits(indexed):
+    indexer, _ = indexed
+
+    first = indexer.search(SOURCE_ID, "base", k=3)
+    expected = _summary(first)
+
+    # El caller modifica los resultados del miss y de un hit exacto
+    for results in (first, indexer.search(SOURCE_ID, "base", k=3)):
+        results[0].score = -1.0
+        results[0].metadata["block_id"] = "modificado"
+        results.pop()
+
+    assert _summary(indexer.search(SOURCE_ID, "base", k=3)) == expected
+    assert _summary(indexer.search(SOURCE_ID, "just above", k=3)) == expected
+
+    # search_with_context expone la metadata del resultado
+    for entry in indexer.search_with_context(SOURCE_ID, "base", k=3):
+        entry["metadata"]["chunk_id"] = "modificado"
+    assert _summary(indexer.search(SOURCE_ID, "base", k=3)) == expected